@@ -0,0 +1,95 @@
+# benchmark_quantization.py
+"""
+Compara a variante int8 (quantização dinâmica de Linear/LSTM, ver
+lib_v5/quantization.py) com o modelo float32 em CPU: tempo por execução e
+SDR da saída int8 contra a saída float32, no início de uma faixa.
+
+Uso:
+    python benchmark_quantization.py htdemucs --audio musica.wav
+    python benchmark_quantization.py htdemucs_6s --seconds 20 --threads 8
+    python benchmark_quantization.py --denoiser models/VR_Models/UVR-DeNoise-Lite.pth --audio musica.wav
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import torch
+
+# --- CONFIGURAÇÕES ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UVR_DIR = os.path.join(BASE_DIR, 'ultimatevocalremovergui-master')
+sys.path.append(UVR_DIR)
+
+from lib_v5.quantization import benchmark_quantized, quantize_dynamic_int8
+
+SAMPLERATE = 44100
+
+# --- FUNÇÕES AUXILIARES ---
+def load_clip(audio_path, seconds):
+    """Início da faixa como tensor (1, 2, n); sem arquivo, ruído fixo."""
+    frames = int(seconds * SAMPLERATE)
+    if audio_path:
+        audio, _ = sf.read(audio_path, frames=frames, dtype='float32', always_2d=True)
+        audio = np.repeat(audio, 2, axis=1) if audio.shape[1] == 1 else audio[:, :2]
+    else:
+        audio = np.random.default_rng(0).uniform(-0.1, 0.1, (frames, 2)).astype(np.float32)
+    return torch.from_numpy(np.ascontiguousarray(audio.T))[None]
+
+def demucs_runs(model_name, clip):
+    from demucs.apply import apply_model
+    from demucs.pretrained import get_model
+    from run_separation import DEMUCS_ARCH_TYPE, build_model_data
+
+    model_data, error = build_model_data(model_name, DEMUCS_ARCH_TYPE)
+    if error:
+        raise SystemExit(error['error'])
+    model = get_model(name=os.path.splitext(os.path.basename(model_data.model_path))[0],
+                      repo=Path(os.path.dirname(model_data.model_path))).eval()
+    quantized = quantize_dynamic_int8(model)
+
+    # Mesma normalização do SeperateDemucs.demix_demucs, sem shifts para as duas saídas serem comparáveis.
+    normalize = lambda x: (x - x[0].mean(0).mean()) / x[0].mean(0).std()
+    run = lambda m: lambda x: apply_model(m, normalize(x), 0, True, 0.25, device='cpu', parallel_bag=False)
+    return run(model), run(quantized)
+
+def denoiser_runs(model_path, clip):
+    from lib_v5 import spec_utils
+    from lib_v5.vr_network import nets_new
+
+    model = nets_new.CascadedNet(2048, nout=16, nout_lstm=128)
+    model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    model.eval()
+    quantized = quantize_dynamic_int8(model)
+
+    spec = np.abs(spec_utils.wave_to_spectrogram_old(clip[0].numpy(), 1024, 2048))
+    spec = torch.from_numpy(spec / spec.max())[None, :, :, :256].float()
+    # O espectrograma é calculado uma vez, fora da medição.
+    return (lambda _: model.predict_mask(spec)), (lambda _: quantized.predict_mask(spec))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da quantização int8 em CPU.")
+    parser.add_argument('model_name', nargs='?', help="modelo Demucs (nome do .yaml/.ckpt em models/Demucs_Models)")
+    parser.add_argument('--denoiser', help="caminho do .pth do denoiser VR, em vez de um modelo Demucs")
+    parser.add_argument('--audio', help="faixa de referência; sem ela, ruído")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=0, help="torch.set_num_threads (0 = padrão)")
+    args = parser.parse_args()
+    if not args.model_name and not args.denoiser:
+        parser.error("informe um modelo Demucs ou --denoiser")
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    clip = load_clip(args.audio, args.seconds)
+    run_float, run_int8 = denoiser_runs(args.denoiser, clip) if args.denoiser else demucs_runs(args.model_name, clip)
+
+    result = benchmark_quantized(run_float, run_int8, clip, repeats=args.repeat)
+    print(f"float32: {result['float32_seconds']:.2f}s | int8: {result['int8_seconds']:.2f}s | "
+          f"speedup {result['speedup']:.2f}x | SDR int8 x float32: {result['sdr_db']:.1f} dB "
+          f"({args.seconds:.0f}s de áudio, {torch.get_num_threads()} threads, engine {torch.backends.quantized.engine})")
+
+if __name__ == '__main__':
+    main()
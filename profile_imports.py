@@ -0,0 +1,93 @@
+# profile_imports.py
+"""
+Mede o tempo de import (cold start) dos módulos do worker com
+`python -X importtime` em um processo novo e falha se o orçamento for
+estourado ou se alguma dependência específica de arquitetura for carregada
+já no import.
+
+Uso:
+    python profile_imports.py                       # runpod_handler e run_separation
+    python profile_imports.py api --top 30
+    IMPORT_BUDGET_SECONDS=3 python profile_imports.py --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# --- CONFIGURAÇÕES ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UVR_DIR = os.path.join(BASE_DIR, 'ultimatevocalremovergui-master')
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_BUDGET_SECONDS', 5))
+DEFAULT_TARGETS = ['runpod_handler', 'run_separation']
+
+# Dependências que só devem ser carregadas quando a arquitetura correspondente for usada
+LAZY_MODULES = [
+    'pytorch_lightning',  # MDX .ckpt (lib_v5.mdxnet)
+    'onnxruntime',        # MDX .onnx
+    'onnx2pytorch',       # MDX .onnx convertido para torch
+    'scipy.signal',       # pitch shift / alinhamento
+    'pydub',              # conversão de formato legada
+    'samplerate',         # reamostragem em blocos (lib_v5.audio_stream)
+    'demucs.hdemucs',     # Demucs v3/v4 (HDemucs)
+    'demucs.model_v2',    # Demucs v2
+    'demucs.pretrained',  # Demucs v3/v4
+]
+
+# --- FUNÇÕES AUXILIARES ---
+def parse_importtime(stderr):
+    """Retorna {módulo: (self_us, cumulativo_us)} a partir da saída do -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def profile_module(module):
+    """Importa `module` em um interpretador novo; retorna (segundos, {módulo: tempos})."""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [UVR_DIR, os.environ.get('PYTHONPATH')]))}
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+    return elapsed, parse_importtime(result.stderr)
+
+def report(module, runs, modules, top):
+    best = min(runs)
+    print(f"\n=== {module}: melhor {best:.2f}s, mediana {sorted(runs)[len(runs) // 2]:.2f}s "
+          f"({len(runs)} execução(ões), orçamento {IMPORT_BUDGET_SECONDS:.2f}s) ===")
+    print(f"{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda m: -m[1][1])[:top]:
+        print(f"{cumulative_us / 1000:16.1f} {self_us / 1000:13.1f}  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"Carregados no import (deveriam ser lazy): {', '.join(eager)}")
+    return best <= IMPORT_BUDGET_SECONDS and not eager
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de tempo de import do worker.")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_TARGETS)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    ok = True
+    for module in args.modules:
+        runs, modules = [], {}
+        for _ in range(max(1, args.repeat)):
+            elapsed, modules = profile_module(module)
+            runs.append(elapsed)
+        ok = report(module, runs, modules, args.top) and ok
+
+    if not ok:
+        print("\nOrçamento de cold start estourado.")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
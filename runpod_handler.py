@@ -1,35 +1,54 @@
 # runpod_handler.py
+import asyncio
 import os
+import re
 import requests
 import runpod
 from argparse import Namespace
 import sys
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import numpy as np
+import soundfile as sf
 import torch
 from pathlib import Path
 
 # Adiciona o diretório do script de separação ao path do Python
 sys.path.append('ultimatevocalremovergui-master')
-from run_separation import execute_separation
+from run_separation import INFERENCE_SLOT, execute_separation, execute_batch, build_model_data, build_process_data, run_model
+from model_registry import MODEL_REGISTRY
+from downloader import download_file
+from timing import JobTimer
 
 # --- LÓGICA DE DOWNLOAD DE MODELOS ---
 BASE_MODEL_URL = "https://github.com/AudioFB/smets-backend/releases/download/v1.0.0-models/"
 
-# Mapeamento de nomes de modelos para seus arquivos e destinos
+# Mapeamento de nomes de modelos para seus arquivos e destinos. "sha256" (opcional) mapeia arquivo -> SHA-256 esperado;
+# os .th do Demucs já trazem o início do próprio SHA-256 no nome (<assinatura>-<sha256[:8]>.th).
 MODEL_FILES = {
     "htdemucs": {
         "files": ["htdemucs.yaml", "955717e8-8726e21a.th"],
-        "dest": "ultimatevocalremovergui-master/models/Demucs_Models/v3_v4_repo"
+        "dest": "ultimatevocalremovergui-master/models/Demucs_Models/v3_v4_repo",
+        "process_method": "Demucs"
     },
     "htdemucs_6s": {
         "files": ["htdemucs_6s.yaml", "5c90dfd2-34c22ccb.th"],
-        "dest": "ultimatevocalremovergui-master/models/Demucs_Models/v3_v4_repo"
+        "dest": "ultimatevocalremovergui-master/models/Demucs_Models/v3_v4_repo",
+        "process_method": "Demucs"
     },
     "Reverb_HQ_By_FoxJoy": {
         "files": ["Reverb_HQ_By_FoxJoy.onnx"],
-        "dest": "ultimatevocalremovergui-master/models/MDX_Net_Models"
+        "dest": "ultimatevocalremovergui-master/models/MDX_Net_Models",
+        "process_method": "MDX-Net"
     }
 }
 
+# Evita que o aquecimento e um job baixem o mesmo arquivo ao mesmo tempo
+MODEL_DOWNLOAD_LOCKS = {model_name: threading.Lock() for model_name in MODEL_FILES}
+
 def download_model_if_needed(model_name):
     """
     Verifica se os arquivos de um modelo existem localmente.
@@ -39,7 +58,18 @@ def download_model_if_needed(model_name):
         print(f"Aviso: Modelo '{model_name}' não está mapeado para download.")
         return
 
-    model_info = MODEL_FILES[model_name]
+    with MODEL_DOWNLOAD_LOCKS[model_name]:
+        download_model_files(MODEL_FILES[model_name])
+
+DEMUCS_CHECKSUM_NAME = re.compile(r'^[0-9a-f]{8}-([0-9a-f]{8})\.th$')
+
+def model_file_checksum(model_info, filename):
+    """SHA-256 (ou prefixo) esperado para um arquivo do modelo, se conhecido."""
+    checksum = model_info.get("sha256", {}).get(filename)
+    match = DEMUCS_CHECKSUM_NAME.match(filename)
+    return checksum or (match.group(1) if match else None)
+
+def download_model_files(model_info):
     dest_path = Path(model_info["dest"])
     dest_path.mkdir(parents=True, exist_ok=True) # Cria o diretório de destino se não existir
 
@@ -52,16 +82,81 @@ def download_model_if_needed(model_name):
         url = BASE_MODEL_URL + filename
         print(f"Baixando modelo '{filename}' de {url}...")
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # O arquivo só aparece em `file_path` depois de completo e verificado.
+            download_file(url, file_path, sha256=model_file_checksum(model_info, filename))
             print(f"Download de '{filename}' concluído.")
         except requests.exceptions.RequestException as e:
             # Se o download falhar, o job deve parar.
             raise RuntimeError(f"Falha ao baixar o modelo '{filename}': {e}") from e
 
+# --- AQUECIMENTO DOS MODELOS NO BOOT ---
+# Modelos baixados, carregados no MODEL_REGISTRY e executados uma vez em segundo
+# plano enquanto o worker já aceita jobs. Vazio desativa o aquecimento.
+WARMUP_MODELS = [m for m in os.environ.get('WARMUP_MODELS', ','.join(MODEL_FILES)).split(',') if m in MODEL_FILES]
+WARMUP_SECONDS = float(os.environ.get('WARMUP_SECONDS', 8))
+
+MODEL_READY = {model_name: threading.Event() for model_name in WARMUP_MODELS}
+WARMUP_STARTED = set()
+
+def warmup_model(model_name):
+    """Baixa o modelo e roda uma separação curta de ruído para carregar pesos e kernels."""
+    download_model_if_needed(model_name)
+
+    model_data, error = build_model_data(model_name, MODEL_FILES[model_name]["process_method"])
+    if error:
+        raise RuntimeError(error["error"])
+
+    work_dir = tempfile.mkdtemp(prefix="warmup-")
+    try:
+        input_path = os.path.join(work_dir, "warmup.wav")
+        noise = np.random.default_rng(0).uniform(-0.1, 0.1, (int(44100 * WARMUP_SECONDS), 2)).astype(np.float32)
+        sf.write(input_path, noise, 44100)
+
+        process_data = build_process_data(input_path, work_dir)
+        process_data['write_to_console'] = lambda text, base_text="": None
+        process_data['export_stem'] = lambda *args, **kwargs: None
+        # Os jobs já são aceitos durante o aquecimento; ele disputa o device pelo mesmo limite de INFERENCE_SLOTS.
+        with INFERENCE_SLOT:
+            run_model(model_data, process_data)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def warmup_models():
+    for model_name in WARMUP_MODELS:
+        WARMUP_STARTED.add(model_name)
+        start = time.time()
+        try:
+            warmup_model(model_name)
+            print(f"Modelo '{model_name}' aquecido em {time.time() - start:.1f}s.")
+        except Exception as e:
+            traceback.print_exc()
+            print(f"Falha no aquecimento do modelo '{model_name}': {e}")
+        finally:
+            MODEL_READY[model_name].set()
+
+def start_warmup():
+    if WARMUP_MODELS:
+        print(f"Aquecendo modelos em segundo plano: {WARMUP_MODELS}")
+        threading.Thread(target=warmup_models, name="model-warmup", daemon=True).start()
+
+# --- CONCORRÊNCIA ---
+# Jobs simultâneos por worker. Acima de 1 o handler fica assíncrono: download, upload e
+# notificação de um job correm enquanto outro ocupa o slot de inferência (INFERENCE_SLOTS),
+# e a notificação vai para segundo plano para liberar o job.
+HANDLER_CONCURRENCY = int(os.environ.get('HANDLER_CONCURRENCY', 1))
+IS_NOTIFY_BACKGROUND = HANDLER_CONCURRENCY > 1
+
+def wait_model_ready(model_name):
+    """
+    Se o aquecimento deste modelo já começou, espera ele terminar em vez de
+    carregar o modelo de novo. Modelos que ainda estão na fila de aquecimento
+    são carregados pelo próprio job (o MODEL_REGISTRY evita a carga dupla).
+    """
+    event = MODEL_READY.get(model_name)
+    if event is not None and model_name in WARMUP_STARTED and not event.is_set():
+        print(f"Aguardando o aquecimento do modelo '{model_name}'...")
+        event.wait()
+
 def handler(job):
     # Bloco de verificação da GPU...
     print("--- VERIFICAÇÃO DE AMBIENTE SERVERLESS ---")
@@ -74,23 +169,100 @@ def handler(job):
     print("-----------------------------------------")
 
     job_input = job['input']
+    if 'tracks' in job_input:
+        return handle_batch(job_input)
     
     try:
         args = Namespace(
             jobId=job_input['jobId'],
             audioUrl=job_input['audioUrl'],
+            audioSha256=job_input.get('audioSha256'),
+            audioSize=job_input.get('audioSize'),
             filename=job_input['originalFilename'],
             model_name=job_input['model_name'],
             process_method=job_input['process_method'],
             baseUrl=job_input['baseUrl'],
+            quantize=job_input.get('quantize'),
+            isRunPod="True"
+        )
+    except KeyError as e:
+        return {"error": f"Parâmetro obrigatório ausente no input: {e}"}
+
+    timer = JobTimer(args.jobId)
+    with timer.span('job'):
+        result = run_job(args, timer)
+
+    print("Tempos por etapa:")
+    timer.print_summary()
+    timer.write_log(model_name=args.model_name, status="error" if result.get("error") else "success")
+    return {**result, "timings": timer.summary()}
+
+def handle_batch(job_input):
+    """
+    Job com várias faixas para o mesmo modelo e parâmetros:
+    {"jobId", "model_name", "process_method", "baseUrl", "quantize" (opcional),
+     "tracks": [{"audioUrl", "originalFilename", "jobId", "audioSha256", "audioSize" (opcionais)}, ...]}
+    Cada faixa é notificada e enviada com o próprio jobId (padrão "<jobId>-<n>").
+    """
+    try:
+        args = Namespace(
+            jobId=job_input['jobId'],
+            model_name=job_input['model_name'],
+            process_method=job_input['process_method'],
+            baseUrl=job_input['baseUrl'],
+            quantize=job_input.get('quantize'),
             isRunPod="True"
         )
+        tracks = [Namespace(
+            jobId=track.get('jobId') or f"{args.jobId}-{i + 1}",
+            audioUrl=track['audioUrl'],
+            audioSha256=track.get('audioSha256'),
+            audioSize=track.get('audioSize'),
+            filename=track['originalFilename'],
+            model_name=args.model_name,
+            process_method=args.process_method,
+            baseUrl=args.baseUrl,
+            isRunPod="True"
+        ) for i, track in enumerate(job_input['tracks'])]
     except KeyError as e:
         return {"error": f"Parâmetro obrigatório ausente no input: {e}"}
+    if not tracks:
+        return {"error": "O lote não tem faixas."}
+
+    timer = JobTimer(args.jobId)
+    track_timers = [JobTimer(track.jobId) for track in tracks]
+    try:
+        with timer.span('wait_warmup'):
+            wait_model_ready(args.model_name)
+        with timer.span('model_download'):
+            download_model_if_needed(args.model_name)
+    except RuntimeError as e:
+        return {"error": str(e), "timings": timer.summary()}
 
+    with timer.span('batch', tracks=len(tracks)):
+        results = execute_batch(args, tracks, track_timers, is_notify_background=IS_NOTIFY_BACKGROUND)
+
+    track_results = []
+    for track, track_timer, result in zip(tracks, track_timers, results):
+        status = "error" if result.get("error") else "success"
+        track_timer.write_log(model_name=args.model_name, batch_id=args.jobId, status=status)
+        track_results.append({"jobId": track.jobId, **result, "timings": track_timer.summary()})
+
+    failed = sum(1 for result in results if result.get("error"))
+    print(f"Lote concluído: {len(tracks) - failed}/{len(tracks)} faixa(s) com sucesso.")
+    print("Tempos do lote:")
+    timer.print_summary()
+    print(f"Modelos residentes: {MODEL_REGISTRY.stats()}")
+    status = "success" if not failed else "error" if failed == len(tracks) else "partial"
+    return {"status": status, "jobId": args.jobId, "tracks": track_results, "timings": timer.summary()}
+
+def run_job(args, timer):
     # --- ETAPA DE OTIMIZAÇÃO: BAIXAR APENAS O MODELO NECESSÁRIO ---
     try:
-        download_model_if_needed(args.model_name)
+        with timer.span('wait_warmup'):
+            wait_model_ready(args.model_name)
+        with timer.span('model_download'):
+            download_model_if_needed(args.model_name)
     except RuntimeError as e:
         return {"error": str(e)}
 
@@ -101,22 +273,31 @@ def handler(job):
 
     try:
         print(f"Baixando arquivo de áudio de: {args.audioUrl}")
-        response = requests.get(args.audioUrl, headers={'User-Agent': 'Mozilla/5.0'}, stream=True)
-        response.raise_for_status()
-        with open(input_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with timer.span('audio_download'):
+            download_file(args.audioUrl, input_path, expected_size=args.audioSize, sha256=args.audioSha256,
+                          headers={'User-Agent': 'Mozilla/5.0'})
         print("Download do áudio concluído.")
     except requests.exceptions.RequestException as e:
         return {"error": f"Falha ao baixar o arquivo do Cloudflare R2: {e}"}
 
-    result = execute_separation(args)
+    result = execute_separation(args, timer, is_notify_background=IS_NOTIFY_BACKGROUND)
 
     if result.get("error"):
         return result
 
+    print(f"Modelos residentes: {MODEL_REGISTRY.stats()}")
     print("Handler concluído com sucesso.")
-    return {"status": "success", "jobId": args.jobId}
+    return {**result, "jobId": args.jobId}
 
-runpod.serverless.start({"handler": handler})
+async def async_handler(job):
+    """O job roda numa thread para não travar o loop que recebe os próximos jobs."""
+    return await asyncio.to_thread(handler, job)
+
+if __name__ == "__main__":
+    start_warmup()
+    if HANDLER_CONCURRENCY > 1:
+        print(f"Handler assíncrono com até {HANDLER_CONCURRENCY} jobs simultâneos.")
+        runpod.serverless.start({"handler": async_handler, "concurrency_modifier": lambda current: HANDLER_CONCURRENCY})
+    else:
+        runpod.serverless.start({"handler": handler})
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do worker são importados pelo nome, a partir da pasta do UVR.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ultimatevocalremovergui-master'))
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+from lib_v5.audio_stream import AudioStream, OverlapAdd, SlidingWindows, make_sink
+
+CHUNK_SIZE = 1024
+STEP = 384
+PAD_LEFT = 128
+
+
+def pad_right(length):
+    return CHUNK_SIZE - length % STEP
+
+
+def fake_model(windows: torch.Tensor):
+    """Position-dependent and non-linear, so misplaced or dropped windows change the output."""
+    return windows * torch.linspace(0.5, 1.5, windows.shape[-1]) + windows ** 2
+
+
+def full_array_overlap_add(mix, window=None, divisor=None):
+    """Reference: the old accumulation over the whole padded track in one array."""
+    length = mix.shape[-1]
+    mixture = np.concatenate((np.zeros((2, PAD_LEFT), np.float32), mix, np.zeros((2, pad_right(length)), np.float32)), 1)
+    result = np.zeros_like(mixture)
+    weight = np.zeros(mixture.shape[-1], np.float32)
+    window = np.ones(CHUNK_SIZE, np.float32) if window is None else window.numpy()
+
+    for offset in range(0, mixture.shape[-1] - CHUNK_SIZE + 1, STEP):
+        output = fake_model(torch.from_numpy(mixture[None, :, offset:offset + CHUNK_SIZE]))[0].numpy()
+        result[:, offset:offset + CHUNK_SIZE] += output * (window if divisor is None else 1)
+        weight[offset:offset + CHUNK_SIZE] += window
+
+    result = result / divisor if divisor is not None else result / np.maximum(weight, 1e-8)
+    return result[:, PAD_LEFT:PAD_LEFT + length]
+
+
+def streamed_overlap_add(mix, batch_size, mode, tmp_path, window=None, divisor=None, block_size=1000):
+    windows = SlidingWindows(mix, CHUNK_SIZE, STEP, pad_left=PAD_LEFT, pad_right=pad_right, block_size=block_size)
+    accumulator = OverlapAdd(CHUNK_SIZE, window=window, divisor=divisor, capacity=CHUNK_SIZE + batch_size * STEP,
+                             sink=make_sink(mode, windows.padded_length(), directory=str(tmp_path)))
+
+    def run_batch(batch):
+        offsets, parts = zip(*batch)
+        accumulator.add(offsets, fake_model(torch.from_numpy(np.stack(parts))))
+        accumulator.flush(offsets[-1] + STEP)
+
+    batch = []
+    for offset, part in windows:
+        batch.append((offset, part))
+        if len(batch) == batch_size:
+            run_batch(batch)
+            batch = []
+    if batch:
+        run_batch(batch)
+
+    return np.asarray(accumulator.result(PAD_LEFT, windows.length))
+
+
+@pytest.fixture
+def mix():
+    return (np.random.default_rng(0).random((2, 10_007), dtype=np.float32) - 0.5)
+
+
+@pytest.mark.parametrize('batch_size', [1, 3])
+@pytest.mark.parametrize('mode', ['host', 'pinned', 'memmap'])
+@pytest.mark.parametrize('weighting', ['window', 'divisor'])
+def test_matches_full_array_accumulation(mix, tmp_path, batch_size, mode, weighting):
+    kwargs = {'window': torch.hann_window(CHUNK_SIZE, periodic=False)} if weighting == 'window' else {'divisor': 2}
+
+    expected = full_array_overlap_add(mix, **kwargs)
+    actual = streamed_overlap_add(mix, batch_size, mode, tmp_path, **kwargs)
+
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_audio_stream_source_matches_array(mix, tmp_path):
+    path = str(tmp_path / 'mix.wav')
+    sf.write(path, mix.T, 44100, subtype='FLOAT')
+    window = torch.hann_window(CHUNK_SIZE, periodic=False)
+
+    # Blocks smaller than a window, so windows straddle block boundaries.
+    stream = AudioStream(path, samplerate=44100, block_size=700)
+    actual = streamed_overlap_add(stream, 2, 'host', tmp_path, window=window, block_size=700)
+
+    np.testing.assert_allclose(actual, full_array_overlap_add(mix, window=window), atol=1e-5)
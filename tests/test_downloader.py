@@ -0,0 +1,131 @@
+import hashlib
+import http.server
+import os
+import re
+import threading
+
+import pytest
+from requests.exceptions import HTTPError
+
+import downloader
+from downloader import DownloadError, download_file, save_state
+
+RANGE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+class FileHandler(http.server.BaseHTTPRequestHandler):
+    """Serve `server.body` com suporte a Range/If-Range; `server.fail_at` devolve 404 para o Range que começa ali."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server, body = self.server, self.server.body
+        range_header, if_range = self.headers.get('Range'), self.headers.get('If-Range')
+        server.requests.append((range_header, if_range))
+
+        match = RANGE.fullmatch(range_header or '')
+        if match and int(match.group(1)) == server.fail_at:
+            self.send_error(404)
+            return
+
+        if match and if_range in (None, server.etag):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(body) - 1
+            total = '*' if server.hide_size else len(body)
+            payload = body[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{total}')
+        else:
+            payload = body
+            self.send_response(200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+    httpd.body, httpd.etag, httpd.requests = os.urandom(1000), '"v1"', []
+    httpd.fail_at, httpd.hide_size = None, False
+    httpd.url = f'http://127.0.0.1:{httpd.server_port}/model.bin'
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def requested_ranges(server):
+    return {range_header for range_header, _ in server.requests if range_header != 'bytes=0-0'}
+
+
+def test_ranged_download_resumes_only_missing_parts(server, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    server.fail_at = 500
+
+    with pytest.raises(HTTPError):
+        download_file(server.url, dest, part_size=100, workers=4)
+    assert os.path.exists(dest + downloader.PART_SUFFIX) and not os.path.exists(dest)
+
+    server.fail_at, server.requests = None, []
+    download_file(server.url, dest, expected_size=1000, sha256=hashlib.sha256(server.body).hexdigest(),
+                  part_size=100, workers=4)
+
+    assert requested_ranges(server) == {'bytes=500-599'}
+    assert open(dest, 'rb').read() == server.body
+    assert not os.path.exists(dest + downloader.PART_SUFFIX)
+    assert not os.path.exists(dest + downloader.STATE_SUFFIX)
+
+
+def test_ranged_download_restarts_when_remote_file_changed(server, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    server.fail_at = 500
+    with pytest.raises(HTTPError):
+        download_file(server.url, dest, part_size=100, workers=4)
+
+    server.body, server.etag, server.fail_at, server.requests = os.urandom(1000), '"v2"', None, []
+    download_file(server.url, dest, part_size=100, workers=4)
+
+    assert len(requested_ranges(server)) == 10
+    assert open(dest, 'rb').read() == server.body
+
+
+def resume_stream(server, dest, done_bytes, validator):
+    # .part de um download sequencial interrompido (servidor sem tamanho conhecido).
+    open(dest + downloader.PART_SUFFIX, 'wb').write(server.body[:done_bytes])
+    save_state(dest + downloader.STATE_SUFFIX, server.url, None, validator, [])
+    server.hide_size = True
+
+
+def test_sequential_download_resumes_with_if_range(server, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    resume_stream(server, dest, 400, '"v1"')
+
+    download_file(server.url, dest)
+
+    assert server.requests[-1] == ('bytes=400-', '"v1"')
+    assert open(dest, 'rb').read() == server.body
+
+
+def test_sequential_download_restarts_when_remote_file_changed(server, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    resume_stream(server, dest, 400, '"v1"')
+    server.body, server.etag = os.urandom(1000), '"v2"'
+
+    download_file(server.url, dest)
+
+    assert server.requests[-1][0] is None
+    assert open(dest, 'rb').read() == server.body
+
+
+def test_checksum_mismatch_discards_the_download(server, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+
+    with pytest.raises(DownloadError):
+        download_file(server.url, dest, sha256='0' * 64, part_size=100)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + downloader.PART_SUFFIX)
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from job_queue import COMPLETE, PROCESSING, QUEUED, JobQueue
+
+
+def make_queue(tmp_path, jobs=0):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    for i in range(jobs):
+        queue.enqueue(f'job-{i}', {'n': i})
+        time.sleep(0.001)
+    return queue
+
+
+def test_claim_returns_oldest_job_once(tmp_path):
+    queue = make_queue(tmp_path, jobs=2)
+
+    assert queue.claim() == ('job-0', {'n': 0})
+    assert queue.claim() == ('job-1', {'n': 1})
+    assert queue.claim() is None
+    assert queue.status('job-0')['status'] == PROCESSING
+    assert queue.running_count() == 2
+
+
+def test_recover_requeues_interrupted_jobs(tmp_path):
+    queue = make_queue(tmp_path, jobs=2)
+    queue.claim()
+    queue.update_progress('job-0', 40)
+    queue.claim()
+    queue.complete('job-1', ['stem.wav'])
+
+    # Reinício do processo: mesmo banco, nova conexão.
+    restarted = JobQueue(queue.db_path)
+    assert restarted.recover() == 1
+
+    job = restarted.status('job-0')
+    assert job['status'] == QUEUED and job['progress'] == 0 and job['queue_position'] == 1
+    assert restarted.status('job-1') == {'status': COMPLETE, 'progress': 100, 'files': ['stem.wav']}
+    assert restarted.claim() == ('job-0', {'n': 0})
+    assert restarted.claim() is None
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    queue = make_queue(tmp_path, jobs=40)
+    claimed, lock = [], threading.Lock()
+
+    def worker():
+        while (job := queue.claim()) is not None:
+            with lock:
+                claimed.append(job[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(f'job-{i}' for i in range(40))
+    assert not queue.has_queued()
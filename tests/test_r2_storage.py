@@ -0,0 +1,105 @@
+import io
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+from r2_storage import MultipartUploadWriter
+
+
+class FakeS3:
+    """Cliente S3 em memória que registra as partes e quantos uploads rodam ao mesmo tempo."""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {'UploadId': 'upload-1'}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Partes mais antigas demoram mais, então terminam fora de ordem.
+            time.sleep(0.02 / PartNumber)
+            if PartNumber == self.fail_part:
+                raise IOError('falha simulada')
+            self.parts[PartNumber] = Body
+            return {'ETag': f'etag-{PartNumber}'}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.completed = MultipartUpload['Parts']
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+
+def write_zip(writer, entries):
+    with zipfile.ZipFile(writer, 'w', zipfile.ZIP_STORED) as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+
+
+def test_parts_complete_in_order_and_assemble_a_valid_zip():
+    client = FakeS3()
+    entries = {f'stem_{i}.wav': os.urandom(50_000) for i in range(6)}
+
+    with MultipartUploadWriter('bucket', 'job.zip', client=client, part_size=32 * 1024, concurrency=3) as writer:
+        write_zip(writer, entries)
+
+    assert [part['PartNumber'] for part in client.completed] == list(range(1, len(client.parts) + 1))
+    assert [part['ETag'] for part in client.completed] == [f'etag-{n}' for n in range(1, len(client.parts) + 1)]
+    assert all(len(client.parts[n]) == 32 * 1024 for n in range(1, len(client.parts)))
+
+    data = b''.join(client.parts[part['PartNumber']] for part in client.completed)
+    assert len(data) == writer.size
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == entries
+    assert not client.aborted
+
+
+def test_in_flight_parts_are_bounded_by_concurrency():
+    client = FakeS3()
+
+    with MultipartUploadWriter('bucket', 'job.zip', client=client, part_size=1024, concurrency=2) as writer:
+        for _ in range(12):
+            writer.write(os.urandom(1024))
+
+    assert len(client.completed) == 12
+    assert client.max_in_flight == 2
+
+
+def test_failed_part_aborts_the_upload():
+    client = FakeS3(fail_part=2)
+
+    with pytest.raises(IOError):
+        with MultipartUploadWriter('bucket', 'job.zip', client=client, part_size=1024, concurrency=2) as writer:
+            writer.write(os.urandom(4 * 1024))
+
+    assert client.aborted
+    assert client.completed is None
+
+
+def test_error_while_writing_aborts_the_upload():
+    client = FakeS3()
+
+    with pytest.raises(RuntimeError):
+        with MultipartUploadWriter('bucket', 'job.zip', client=client, part_size=1024) as writer:
+            writer.write(os.urandom(3 * 1024))
+            raise RuntimeError('job falhou')
+
+    assert client.aborted
+    assert client.completed is None
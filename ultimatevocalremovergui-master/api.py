@@ -2,15 +2,17 @@ import os
 import uuid
 import traceback
 import shutil
-import threading
-import json
-import hashlib
 from argparse import Namespace
-from flask import Flask, request, send_from_directory, jsonify
+from flask import Flask, Request, request, send_from_directory, jsonify
 from flask_cors import CORS
 
 from separate import SeperateDemucs, SeperateMDX, SeperateMDXC
 from lib_v5.vr_network.model_param_init import ModelParameters
+from job_queue import JobQueue, WorkerPool
+from stem_export import StemExporter
+from model_catalog import MODEL_CATALOG
+from ingest import UploadIngest, open_decoded, wait_decoded
+from result_cache import RESULT_CACHE, ZIP_ENTRY, make_cache_key, stem_suffix
 
 # --- DEFINIÇÃO MANUAL DE CONSTANTES ---
 DEMUCS_ARCH_TYPE = 'Demucs'
@@ -31,118 +33,144 @@ UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'outputs'
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_FOLDER = os.path.join(BASE_DIR, 'models')
+# Chunks do MDX-Net/MDX-C processados por chamada do modelo (1 = um chunk por vez)
+MDX_BATCH_SIZE = max(1, int(os.environ.get('MDX_BATCH_SIZE', 4)))
+# Mix em streaming: segundos decodificados por bloco
+STREAM_BLOCK_SECONDS = float(os.environ.get('STREAM_BLOCK_SECONDS', 10))
+# Destino da saída do overlap-add do MDX/MDX-C: 'auto' (pinned com CUDA, host sem), 'host', 'pinned' ou 'memmap'
+# (arquivo temporário em ACCUMULATION_DIR, para faixas longas que não devem ficar na RAM)
+ACCUMULATION_MODE = os.environ.get('ACCUMULATION_MODE', 'auto')
+ACCUMULATION_DIR = os.environ.get('ACCUMULATION_DIR') or None
+
+class IngestRequest(Request):
+    """Grava os arquivos enviados direto em uploads/ (com hash e decodificação) enquanto o corpo chega."""
+    job_id = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        job_id = self.job_id or str(uuid.uuid4())
+        return UploadIngest(os.path.join(UPLOAD_FOLDER, f"{job_id}_{os.path.basename(filename or 'upload')}"))
 
 app = Flask(__name__)
+app.request_class = IngestRequest
 CORS(app, resources={r"/*": {"origins": "https://audiofb.com"}})
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-JOB_STATUS = {}
-job_status_lock = threading.Lock()
+JOB_QUEUE = JobQueue()
 
 # --- FUNÇÕES AUXILIARES ---
-def get_model_hash(model_path):
-    try:
-        with open(model_path, 'rb') as f:
-            f.seek(-10000 * 1024, 2)
-            return hashlib.md5(f.read()).hexdigest()
-    except:
-        return hashlib.md5(open(model_path, 'rb').read()).hexdigest()
-
-def load_json_data(json_path):
-    with open(json_path, 'r') as f:
-        return json.load(f)
-
-MDX_HASH_JSON = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', 'model_data', 'model_data.json')
-MDX_MODEL_PARAMS = load_json_data(MDX_HASH_JSON)
-
-def get_models_from_dir(directory):
-    models = []
-    if not os.path.isdir(directory):
-        print(f"Diretório não encontrado: {directory}")
-        return models
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(('.onnx', '.ckpt', '.yaml', '.gz', '.th')):
-                models.append(os.path.splitext(file)[0])
-    return sorted(list(set(models)))
-
 @app.route('/models', methods=['GET'])
 def get_models():
     try:
-        mdx_models = get_models_from_dir(os.path.join(MODELS_FOLDER, 'MDX_Net_Models'))
-        demucs_models = get_models_from_dir(os.path.join(MODELS_FOLDER, 'Demucs_Models'))
+        catalog = MODEL_CATALOG.list_models()
         
         models = {
-            'MDX-Net': mdx_models,
-            'Demucs': demucs_models
+            'MDX-Net': catalog.get(MDX_ARCH_TYPE, []),
+            'Demucs': catalog.get(DEMUCS_ARCH_TYPE, [])
         }
         return jsonify(models)
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": "Erro ao listar modelos"}), 500
 
-def run_separation_in_background(job_id, model_data, process_data, app_context):
-    with app_context:
-        try:
-            separator = None
-            if model_data.process_method == DEMUCS_ARCH_TYPE:
-                separator = SeperateDemucs(model_data=model_data, process_data=process_data)
-            elif model_data.process_method == MDX_ARCH_TYPE:
-                if getattr(model_data, 'is_mdx_c', False):
-                    separator = SeperateMDXC(model_data=model_data, process_data=process_data)
-                else:
-                    separator = SeperateMDX(model_data=model_data, process_data=process_data)
-
-            if separator:
-                separator.seperate()
-                result_files = os.listdir(process_data['export_path'])
-                with job_status_lock:
-                    JOB_STATUS[job_id]['status'] = 'complete'
-                    JOB_STATUS[job_id]['progress'] = 100
-                    JOB_STATUS[job_id]['files'] = result_files
+def run_separation_job(job_id, payload):
+    """Executa um job da fila. Retorna a lista de arquivos gerados."""
+    input_path, output_path_for_job = payload['input_path'], payload['output_path']
+
+    def update_progress(base, step=0):
+        progress = int((base + step) * 100)
+        JOB_QUEUE.update_progress(job_id, min(progress, 99))
+    
+    process_data = {
+        'audio_file': input_path, 'audio_file_base': os.path.splitext(os.path.basename(input_path))[0],
+        'export_path': output_path_for_job, 'set_progress_bar': update_progress,
+        'write_to_console': lambda text, base_text="": None, 'process_iteration': lambda: None,
+        'cached_source_callback': lambda *args, **kwargs: (None, None),
+        'cached_model_source_holder': lambda *args, **kwargs: None,
+        'is_ensemble_master': False, 'is_4_stem_ensemble': False, 'list_all_models': []
+    }
+    model_data = build_model_data(payload['model_name'], payload['process_method'])
+    audio_file_base = process_data['audio_file_base']
+
+    # O SHA-256 calculado no upload evita reler o arquivo para montar a chave do cache de resultados.
+    cache_key = None
+    if RESULT_CACHE.enabled and payload.get('audio_sha256') and os.path.exists(model_data.model_path):
+        cache_key = make_cache_key(payload['audio_sha256'], MODEL_CATALOG.fingerprint(model_data.model_path), model_data)
+        cached = RESULT_CACHE.get(cache_key, output_path_for_job)
+        print(f"Cache de resultados: {'hit' if cached else 'miss'} {RESULT_CACHE.stats()}")
+        if cached:
+            _, files = cached
+            zip_cached = files.pop(ZIP_ENTRY, None)
+            if zip_cached:
+                os.remove(zip_cached)
+            for suffix, path in files.items():
+                os.replace(path, os.path.join(output_path_for_job, f"{audio_file_base}{suffix}"))
+            return os.listdir(output_path_for_job)
+
+    # Áudio decodificado durante o upload (ver ingest.py), lido em blocos pelo separador.
+    decoded_path = payload.get('decoded_path')
+    if decoded_path and wait_decoded(decoded_path):
+        mix = open_decoded(decoded_path, model_data.stream_block_size)
+        process_data['mix'] = mix if model_data.is_stream_mix else mix.load()
+
+    with app.app_context():
+        separator = None
+        if model_data.process_method == DEMUCS_ARCH_TYPE:
+            separator = SeperateDemucs(model_data=model_data, process_data=process_data)
+        elif model_data.process_method == MDX_ARCH_TYPE:
+            if getattr(model_data, 'is_mdx_c', False):
+                separator = SeperateMDXC(model_data=model_data, process_data=process_data)
             else:
-                 raise ValueError("Método de processamento não suportado")
-        except Exception as e:
-            traceback.print_exc()
-            with job_status_lock:
-                JOB_STATUS[job_id]['status'] = 'error'
-                JOB_STATUS[job_id]['error_message'] = str(e)
+                separator = SeperateMDX(model_data=model_data, process_data=process_data)
+
+        if separator:
+            with StemExporter(None, model_data.wav_type_set, model_data.mp3_bit_set) as exporter:
+                process_data['export_stem'] = exporter.submit
+                separator.seperate()
+            stems = os.listdir(process_data['export_path'])
+            if cache_key:
+                RESULT_CACHE.put(cache_key, {'audio_file_base': audio_file_base},
+                                 {stem_suffix(stem, audio_file_base): os.path.join(output_path_for_job, stem) for stem in stems})
+            return stems
+        else:
+             raise ValueError("Método de processamento não suportado")
 
 @app.route('/process', methods=['POST'])
 def process_audio():
-    if 'audio_file' not in request.files: return jsonify({"error": "Nenhum arquivo"}), 400
+    # O job_id é definido antes de ler o formulário para o upload já ser gravado com o nome final.
+    job_id = request.job_id = str(uuid.uuid4())
+
+    def reject(message):
+        for uploaded in request.files.values():
+            uploaded.stream.discard()
+        return jsonify({"error": message}), 400
+
+    if 'audio_file' not in request.files: return reject("Nenhum arquivo")
     file = request.files['audio_file']
-    if file.filename == '': return jsonify({"error": "Nome inválido"}), 400
+    if file.filename == '': return reject("Nome inválido")
     
     model_name_from_request = request.form.get('model_name')
     process_method_from_request = request.form.get('process_method')
     
     if not model_name_from_request or not process_method_from_request:
-        return jsonify({"error": "Modelo ou método de processamento não especificado"}), 400
+        return reject("Modelo ou método de processamento não especificado")
 
-    job_id = str(uuid.uuid4())
-    input_path = os.path.join(UPLOAD_FOLDER, f"{job_id}_{file.filename}")
-    file.save(input_path)
+    ingest = file.stream
+    audio_info = ingest.finish()
+    input_path = ingest.path
     output_path_for_job = os.path.join(OUTPUT_FOLDER, job_id)
     os.makedirs(output_path_for_job, exist_ok=True)
 
-    def update_progress(base, step=0):
-        progress = int((base + step) * 100)
-        with job_status_lock:
-            if job_id in JOB_STATUS and progress > JOB_STATUS[job_id].get('progress', 0):
-                JOB_STATUS[job_id]['progress'] = min(progress, 99)
-    
-    process_data = {
-        'audio_file': input_path, 'audio_file_base': os.path.splitext(os.path.basename(input_path))[0],
-        'export_path': output_path_for_job, 'set_progress_bar': update_progress,
-        'write_to_console': lambda text, base_text="": None, 'process_iteration': lambda: None,
-        'cached_source_callback': lambda *args, **kwargs: (None, None),
-        'cached_model_source_holder': lambda *args, **kwargs: None,
-        'is_ensemble_master': False, 'is_4_stem_ensemble': False, 'list_all_models': []
-    }
+    JOB_QUEUE.enqueue(job_id, {
+        'input_path': input_path, 'output_path': output_path_for_job,
+        'model_name': model_name_from_request, 'process_method': process_method_from_request,
+        **audio_info
+    }, audio_seconds=audio_info['audio_seconds'])
 
+    return jsonify({"job_id": job_id}), 202
+
+def build_model_data(model_name_from_request, process_method_from_request):
     params = {}
     model_path = ""
     
@@ -156,8 +184,7 @@ def process_audio():
             model_path = ckpt_path
             params['is_mdx_ckpt'] = True
         
-        model_hash = get_model_hash(model_path)
-        model_params_json = MDX_MODEL_PARAMS.get(model_hash, {})
+        model_params_json = MODEL_CATALOG.mdx_params(model_path)
         params['compensate'] = model_params_json.get('compensate', 1.035)
         params['mdx_dim_f_set'] = model_params_json.get('mdx_dim_f_set')
         params['mdx_dim_t_set'] = model_params_json.get('mdx_dim_t_set')
@@ -182,7 +209,7 @@ def process_audio():
             **dict(
                 is_mdx_ckpt=False, is_tta=False, is_post_process=False, is_high_end_process='none', 
                 post_process_threshold=0.1, aggression_setting=0.1, batch_size=4, window_size=512, 
-                is_denoise=False, is_denoise_model=False, is_mdx_c_seg_def=False, mdx_batch_size=1, 
+                is_denoise=False, is_denoise_model=False, is_mdx_c_seg_def=False, mdx_batch_size=MDX_BATCH_SIZE, 
                 compensate=1.035, mdx_segment_size=256, mdx_dim_f_set=None, mdx_dim_t_set=None, 
                 mdx_n_fft_scale_set=None, chunks=0, margin=44100, demucs_version=DEMUCS_V4, 
                 segment=DEFAULT, shifts=2, overlap=0.25, is_split_mode=True, is_chunk_demucs=True, 
@@ -205,7 +232,8 @@ def process_audio():
                 bv_model_rebalance=0.0, is_sec_bv_rebalance=False, deverb_vocal_opt=None, 
                 is_save_vocal_only=False, secondary_model_4_stem=[None]*4, 
                 secondary_model_4_stem_scale=[0.5]*4, ensemble_primary_stem=VOCAL_STEM, 
-                is_multi_stem_ensemble=False
+                is_multi_stem_ensemble=False, is_stream_mix=True, stream_block_size=int(44100 * STREAM_BLOCK_SECONDS),
+                accumulation_mode=ACCUMULATION_MODE, accumulation_dir=ACCUMULATION_DIR
             ), 
             **params, 
             **dict(
@@ -214,20 +242,12 @@ def process_audio():
             )
         }
     )
-    
-    with job_status_lock:
-        JOB_STATUS[job_id] = {'status': 'processing', 'progress': 0, 'files': []}
-
-    thread = threading.Thread(target=run_separation_in_background, args=(job_id, model_data, process_data, app.app_context()))
-    thread.start()
-
-    return jsonify({"job_id": job_id}), 202
+    return model_data
 
 @app.route('/status/<job_id>', methods=['GET'])
 def get_status(job_id):
-    with job_status_lock:
-        job = JOB_STATUS.get(job_id)
-        return jsonify(job) if job else (jsonify({"status": "not_found"}), 404)
+    job = JOB_QUEUE.status(job_id, workers=WORKER_POOL.workers)
+    return jsonify(job) if job else (jsonify({"status": "not_found"}), 404)
 
 @app.route('/download/<job_id>/<filename>')
 def download_file(job_id, filename):
@@ -240,8 +260,7 @@ def cleanup_files():
     job_id = data.get('job_id')
     if not job_id: return jsonify({"error": "job_id não fornecido"}), 400
     try:
-        with job_status_lock:
-            if job_id in JOB_STATUS: del JOB_STATUS[job_id]
+        JOB_QUEUE.delete(job_id)
         output_dir = os.path.join(OUTPUT_FOLDER, job_id)
         if os.path.exists(output_dir): shutil.rmtree(output_dir)
         for f in os.listdir(UPLOAD_FOLDER):
@@ -250,5 +269,13 @@ def cleanup_files():
     except Exception as e:
         return jsonify({"error": "Erro na limpeza"}), 500
 
+WORKER_POOL = WorkerPool(JOB_QUEUE, run_separation_job)
+
+@app.before_request
+def start_workers():
+    # Workers sobem com o servidor (primeiro request), não no import do módulo.
+    WORKER_POOL.start()
+
 if __name__ == '__main__':
+    WORKER_POOL.start()
     app.run(host='0.0.0.0', port=5010)
\ No newline at end of file
@@ -0,0 +1,74 @@
+# artifact_cache.py
+import hashlib
+import json
+import os
+import threading
+
+# --- CONFIGURAÇÕES ---
+# Artefatos derivados dos modelos (ONNX otimizado, quantizado, compilado...), gerados uma vez e reaproveitados
+ARTIFACT_CACHE_DIR = os.environ.get('ARTIFACT_CACHE_DIR', '/tmp/model_artifacts')
+ARTIFACT_CACHE_ENABLED = os.environ.get('ARTIFACT_CACHE_ENABLED', '1') != '0'
+
+# --- FUNÇÕES AUXILIARES ---
+def artifact_key(*parts):
+    """Hash das partes da chave (hash do modelo, versões, formato...). Valores não serializáveis entram pelo repr()."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=repr).encode('utf-8')).hexdigest()[:32]
+
+class ArtifactCache:
+    """
+    Diretório de artefatos derivados de modelos, um arquivo por chave em
+    `<root>/<tipo>/<chave><sufixo>`. O artefato é gerado em um arquivo
+    temporário e renomeado atomicamente, então workers que o geram ao mesmo
+    tempo não deixam um arquivo pela metade para os outros.
+    """
+
+    def __init__(self, root=ARTIFACT_CACHE_DIR, enabled=ARTIFACT_CACHE_ENABLED):
+        self.root = root
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._path_locks = {}
+
+    def path(self, kind, key_parts, suffix=''):
+        return os.path.join(self.root, kind, artifact_key(*key_parts) + suffix)
+
+    def _path_lock(self, path):
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    def get(self, kind, key_parts, suffix=''):
+        """Caminho do artefato se ele já existir, senão None."""
+        if not self.enabled:
+            return None
+        path = self.path(kind, key_parts, suffix)
+        return path if os.path.exists(path) else None
+
+    def get_or_build(self, kind, key_parts, build, suffix=''):
+        """
+        Caminho do artefato, gerando-o com `build(caminho_temporário)` se ainda
+        não existir. Retorna None se o cache estiver desativado ou a geração
+        falhar; quem chama segue então com o modelo original.
+        """
+        if not self.enabled:
+            return None
+
+        path = self.path(kind, key_parts, suffix)
+        with self._path_lock(path):
+            if os.path.exists(path):
+                return path
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # O sufixo fica no fim do temporário: algumas bibliotecas escolhem o formato pela extensão.
+            tmp_path = f"{path[:len(path) - len(suffix)]}.tmp-{os.getpid()}-{threading.get_ident()}{suffix}"
+            try:
+                build(tmp_path)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"Falha ao gerar o artefato {kind} ({os.path.basename(path)}): {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+
+            print(f"Artefato {kind} gerado: {path}")
+            return path
+
+ARTIFACT_CACHE = ArtifactCache()
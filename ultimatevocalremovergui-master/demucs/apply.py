@@ -8,13 +8,16 @@ Code to apply a model to a mix. It will handle chunking with overlaps and
 inteprolation between chunks, as well as the "shift trick".
 """
 from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import random
+import threading
 import typing as tp
 from multiprocessing import Process,Queue,Pipe
 
 import torch as th
 from torch import nn
 from torch.nn import functional as F
+import psutil
 import tqdm
 import tkinter as tk
 
@@ -26,6 +29,16 @@ Model = tp.Union[Demucs, HDemucs]
 
 progress_bar_num = 0
 
+# Rough activation footprint of one segment, as a multiple of its input size in bytes.
+# Used to pick the split batch size when `batch_size` is 0.
+SEGMENT_ACTIVATION_FACTOR = 768
+MAX_SPLIT_BATCH_SIZE = 16
+FREE_MEMORY_HEADROOM = 0.8
+
+# Fraction of the device memory available to the current thread, set by `BagExecutor`
+# when several sub-models share one device.
+_local = threading.local()
+
 class BagOfModels(nn.Module):
     def __init__(self, models: tp.List[Model],
                  weights: tp.Optional[tp.List[tp.List[float]]] = None,
@@ -121,6 +134,66 @@ def tensor_chunk(tensor_or_chunk):
         assert isinstance(tensor_or_chunk, th.Tensor)
         return TensorChunk(tensor_or_chunk)
 
+def free_memory_bytes(device):
+    device = th.device(device)
+    if device.type == 'cuda':
+        return th.cuda.mem_get_info(device)[0]
+    return psutil.virtual_memory().available
+
+def auto_batch_size(segment_length, channels, device, max_batch_size=MAX_SPLIT_BATCH_SIZE):
+    """Number of segments that fit in the free memory of `device`."""
+    per_segment = segment_length * channels * 4 * SEGMENT_ACTIVATION_FACTOR
+    memory_share = getattr(_local, 'memory_share', 1.)
+    fitting = int(free_memory_bytes(device) * FREE_MEMORY_HEADROOM * memory_share // per_segment)
+    return max(1, min(max_batch_size, fitting))
+
+class BagExecutor:
+    """
+    Runs the sub-models of a bag concurrently on a shared input. Each sub-model
+    stays resident on its own device (round-robin over the visible GPUs when
+    `device` is a plain 'cuda') with its own CUDA stream; without a GPU the
+    sub-models run in a thread pool.
+    """
+
+    def __init__(self, bag: BagOfModels, device):
+        self.device = device
+        if device.type == 'cuda' and device.index is None and th.cuda.device_count() > 1:
+            devices = [th.device('cuda', i % th.cuda.device_count()) for i in range(len(bag.models))]
+        else:
+            devices = [device] * len(bag.models)
+
+        self.placements = []
+        for sub_model, sub_device in zip(bag.models, devices):
+            sub_model.to(sub_device).eval()
+            stream = th.cuda.Stream(sub_device) if sub_device.type == 'cuda' else None
+            self.placements.append((sub_model, sub_device, stream, devices.count(sub_device)))
+        self.pool = ThreadPoolExecutor(len(bag.models))
+
+    def _run(self, index, mix, kwargs, autocast_dtype):
+        sub_model, sub_device, stream, sharing = self.placements[index]
+        _local.memory_share = 1 / sharing
+        kwargs = {**kwargs, 'device': sub_device}
+        if kwargs['seed'] is not None:
+            kwargs['seed'] += index + 1
+        # Grad mode is thread local, so it has to be disabled again in the worker.
+        # So is autocast: the caller's reduced-precision mode is entered again here.
+        autocast = th.autocast(sub_device.type, dtype=autocast_dtype) if autocast_dtype is not None else contextlib.nullcontext()
+        with th.cuda.stream(stream) if stream is not None else contextlib.nullcontext(), th.no_grad(), autocast:
+            return apply_model(sub_model, mix, **kwargs)
+
+    def map(self, mix, kwargs):
+        device_type = self.device.type
+        autocast_dtype = th.get_autocast_dtype(device_type) if th.is_autocast_enabled(device_type) else None
+        futures = [self.pool.submit(self._run, index, mix, kwargs, autocast_dtype) for index in range(len(self.placements))]
+        return [future.result() for future in futures]
+
+def bag_executor(bag: BagOfModels, device):
+    """Returns the executor cached on `bag`, so sub-models are only placed once."""
+    executor = getattr(bag, '_executor', None)
+    if executor is None or executor.device != device:
+        executor = bag._executor = BagExecutor(bag, device)
+    return executor
+
 def apply_model(model, 
                 mix, 
                 shifts=1, 
@@ -132,7 +205,11 @@ def apply_model(model,
                 device=None, 
                 progress=False, 
                 num_workers=0, 
-                pool=None): 
+                pool=None,
+                batch_size=1,
+                batch_shifts=False,
+                seed=None,
+                parallel_bag=False): 
     """
     Apply model to a given mixture.
 
@@ -149,6 +226,13 @@ def apply_model(model,
             execute the computation, otherwise `mix.device` is assumed.
             When `device` is different from `mix.device`, only local computations will
             be on `device`, while the entire tracks will be stored on `mix.device`.
+        batch_size (int): number of full-length segments stacked into one forward pass
+            in split mode. 1 keeps one call per segment, 0 picks it from free memory.
+        batch_shifts (bool): if True, all `shifts` shifted copies of `mix` are stacked
+            in the batch dimension and separated in a single split pass.
+        seed (int or None): seeds the shift offsets so outputs are reproducible.
+        parallel_bag (bool): for a `BagOfModels`, run the sub-models concurrently with
+            a `BagExecutor` instead of moving each one to `device` in turn.
     """
     
     global fut_length
@@ -175,6 +259,9 @@ def apply_model(model,
         'pool': pool,
         'set_progress_bar': set_progress_bar,
         'static_shifts': static_shifts,
+        'batch_size': batch_size,
+        'batch_shifts': batch_shifts,
+        'seed': seed,
     }
     
     if isinstance(model, BagOfModels):
@@ -187,14 +274,21 @@ def apply_model(model,
         bag_num = len(model.models)
         fut_length = 0
         prog_bar = 0
-        current_model = 0 #(bag_num + 1)
-        for sub_model, weight in zip(model.models, model.weights):
-            original_model_device = next(iter(sub_model.parameters())).device
-            sub_model.to(device)
-            fut_length += fut_length
-            current_model += 1
-            out = apply_model(sub_model, mix, **kwargs)
-            sub_model.to(original_model_device)
+
+        def run_sequential():
+            current_model = 0 #(bag_num + 1)
+            for sub_model in model.models:
+                original_model_device = next(iter(sub_model.parameters())).device
+                sub_model.to(device)
+                current_model += 1
+                if seed is not None:
+                    kwargs['seed'] = seed + current_model
+                out = apply_model(sub_model, mix, **kwargs)
+                sub_model.to(original_model_device)
+                yield out
+
+        outs = bag_executor(model, device).map(mix, kwargs) if parallel_bag else run_sequential()
+        for out, weight in zip(outs, model.weights):
             for k, inst_weight in enumerate(weight):
                 out[:, k, :, :] *= inst_weight
                 totals[k] += inst_weight
@@ -215,9 +309,19 @@ def apply_model(model,
         max_shift = int(0.5 * model.samplerate)
         mix = tensor_chunk(mix)
         padded_mix = mix.padded(length + 2 * max_shift)
+        rng = random.Random(seed) if seed is not None else random
+        offsets = [rng.randint(0, max_shift) for _ in range(shifts)]
+        if batch_shifts:
+            # Every shifted view has the same length (length + max_shift), so they can be
+            # stacked along the batch dimension and go through one split pass together.
+            kwargs['static_shifts'] = 1
+            shifted = th.cat([padded_mix[..., offset:offset + length + max_shift] for offset in offsets])
+            shifted_out = apply_model(model, shifted, **kwargs)
+            shifted_out = shifted_out.view(shifts, batch, *shifted_out.shape[1:])
+            out = sum(shifted_out[k, ..., max_shift - offset:max_shift - offset + length] for k, offset in enumerate(offsets))
+            return out / shifts
         out = 0
-        for _ in range(shifts):
-            offset = random.randint(0, max_shift)
+        for offset in offsets:
             shifted = TensorChunk(padded_mix, offset, length + max_shift - offset)
             shifted_out = apply_model(model, shifted, **kwargs)
             out += shifted_out[..., max_shift - offset:]
@@ -240,6 +344,38 @@ def apply_model(model,
         # If the overlap < 50%, this will translate to linear transition when
         # transition_power is 1.
         weight = (weight / weight.max())**transition_power
+        total_segments = len(offsets)
+
+        def update_progress(count):
+            global fut_length
+            global prog_bar
+            fut_length = (total_segments * bag_num * static_shifts)
+            prog_bar += count
+            set_progress_bar(0.1, (0.8/fut_length*prog_bar))
+
+        if batch_size != 1:
+            # Full-length segments all have the same padded length, so they are stacked
+            # and folded back with one index_add_ per batch. The shorter tail segments
+            # go through the per-segment path below.
+            full_offsets = [offset for offset in offsets if offset + segment <= length]
+            if batch_size <= 0:
+                batch_size = auto_batch_size(segment, batch * channels, device)
+            valid_length = model.valid_length(segment) if hasattr(model, 'valid_length') else segment
+            positions = th.arange(segment, device=mix.device)
+            fold_weight = weight.to(mix.device)
+            for start in range(0, len(full_offsets), batch_size):
+                batch_offsets = full_offsets[start:start + batch_size]
+                chunks = th.cat([TensorChunk(mix, offset, segment).padded(valid_length) for offset in batch_offsets]).to(device)
+                with th.no_grad():
+                    chunk_out = center_trim(model(chunks), segment).to(mix.device)
+                chunk_out = (fold_weight * chunk_out).view(len(batch_offsets), batch, *chunk_out.shape[1:])
+                chunk_positions = (th.tensor(batch_offsets, device=mix.device)[:, None] + positions).flatten()
+                out.index_add_(3, chunk_positions, chunk_out.permute(1, 2, 3, 0, 4).reshape(*out.shape[:3], -1))
+                sum_weight.index_add_(0, chunk_positions, fold_weight.repeat(len(batch_offsets)))
+                if set_progress_bar:
+                    update_progress(len(batch_offsets))
+            offsets = [offset for offset in offsets if offset + segment > length]
+
         futures = []
         for offset in offsets:
             chunk = TensorChunk(mix, offset, segment)
@@ -250,9 +386,7 @@ def apply_model(model,
             futures = tqdm.tqdm(futures, unit_scale=scale, ncols=120, unit='seconds')
         for future, offset in futures:
             if set_progress_bar:
-                fut_length = (len(futures) * bag_num * static_shifts)
-                prog_bar += 1
-                set_progress_bar(0.1, (0.8/fut_length*prog_bar))
+                update_progress(1)
             chunk_out = future.result()
             chunk_length = chunk_out.shape[-1]
             out[..., offset:offset + segment] += (weight[:chunk_length] * chunk_out).to(mix.device)
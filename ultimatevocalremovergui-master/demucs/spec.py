@@ -7,7 +7,10 @@
 
 import torch as th
 
+from lib_v5.precision import float32_only
 
+
+@float32_only
 def spectro(x, n_fft=512, hop_length=None, pad=0):
     *other, length = x.shape
     x = x.reshape(-1, length)
@@ -30,6 +33,7 @@ def spectro(x, n_fft=512, hop_length=None, pad=0):
     return z.view(*other, freqs, frame)
 
 
+@float32_only
 def ispectro(z, hop_length=None, length=None, pad=0):
     *other, freqs, frames = z.shape
     n_fft = 2 * freqs - 2
@@ -0,0 +1,181 @@
+# downloader.py
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- CONFIGURAÇÕES ---
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 8))
+DOWNLOAD_PART_MB = int(os.environ.get('DOWNLOAD_PART_MB', 16))
+DOWNLOAD_TIMEOUT = float(os.environ.get('DOWNLOAD_TIMEOUT', 60))
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.part.json'
+
+_session = None
+_session_lock = threading.Lock()
+
+class DownloadError(requests.exceptions.RequestException):
+    """Download incompleto ou que não passou na verificação de tamanho/checksum."""
+
+# --- FUNÇÕES AUXILIARES ---
+def get_session():
+    """Sessão HTTP compartilhada, com pool de conexões e retry com backoff."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=('HEAD', 'GET'))
+            adapter = HTTPAdapter(pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS * 2, max_retries=retry)
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def probe(url, headers):
+    """Retorna (url_final, tamanho, aceita_range, validador) seguindo redirecionamentos."""
+    session = get_session()
+    response = session.get(url, headers={**headers, 'Range': 'bytes=0-0'}, stream=True,
+                           allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    response.close()
+
+    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    if response.status_code == 206 and '/' in response.headers.get('Content-Range', ''):
+        size = response.headers['Content-Range'].rsplit('/', 1)[1]
+        return response.url, int(size) if size.isdigit() else None, size.isdigit(), validator
+
+    size = response.headers.get('Content-Length')
+    return response.url, int(size) if size and size.isdigit() else None, False, validator
+
+def load_state(state_path, url, size, validator):
+    """Partes já concluídas de um download anterior do mesmo arquivo remoto (None se não houver)."""
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('url') != url or state.get('size') != size or state.get('validator') != validator:
+        return None
+    return set(state.get('done', []))
+
+def save_state(state_path, url, size, validator, done):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'url': url, 'size': size, 'validator': validator, 'done': sorted(done)}, f)
+    os.replace(tmp_path, state_path)
+
+def fetch_range(url, headers, part_path, start, end):
+    session = get_session()
+    with session.get(url, headers={**headers, 'Range': f'bytes={start}-{end}'}, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise DownloadError(f"Servidor ignorou o Range {start}-{end} de {url}")
+        written = 0
+        with open(part_path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+    if written != end - start + 1:
+        raise DownloadError(f"Range {start}-{end} de {url} incompleto ({written} bytes)")
+
+def is_strong_validator(validator):
+    return bool(validator) and not validator.startswith('W/')
+
+def fetch_stream(url, headers, part_path, state_path, size, validator):
+    """
+    Download sequencial, retomando do fim do arquivo .part quando o servidor
+    permitir. Só retoma se o .part veio do mesmo arquivo remoto (validador forte
+    igual ao salvo no estado), e manda If-Range para o servidor devolver o
+    arquivo inteiro se ele mudou desde então.
+    """
+    session = get_session()
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    resumable = is_strong_validator(validator) and load_state(state_path, url, size, validator) is not None
+    if not resumable or (size is not None and offset > size):
+        offset = 0
+    if size is not None and offset == size:
+        return
+    save_state(state_path, url, size, validator, [])
+    request_headers = {**headers, 'Range': f'bytes={offset}-', 'If-Range': validator} if offset else headers
+
+    with session.get(url, headers=request_headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        mode = 'ab' if offset and response.status_code == 206 else 'wb'
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE):
+                f.write(chunk)
+
+def download_file(url, dest_path, expected_size=None, sha256=None, headers=None, workers=DOWNLOAD_WORKERS,
+                  part_size=DOWNLOAD_PART_MB * 1024**2):
+    """
+    Baixa `url` para `dest_path` com requisições Range paralelas sobre a sessão
+    compartilhada. O conteúdo vai para um arquivo `.part` pré-alocado e só é
+    renomeado (atomicamente) para `dest_path` depois de conferir tamanho e,
+    se informado, o SHA-256 (`sha256` pode ser só o início do hex, como nos
+    nomes dos .th do Demucs). Um download interrompido é retomado das partes
+    que já tinham sido concluídas.
+    """
+    dest_path = str(dest_path)
+    expected_size = int(expected_size) if expected_size is not None else None
+    headers = {**DEFAULT_HEADERS, **(headers or {})}
+    part_path, state_path = dest_path + PART_SUFFIX, dest_path + STATE_SUFFIX
+
+    final_url, size, is_ranged, validator = probe(url, headers)
+    if expected_size is not None and size is not None and size != expected_size:
+        raise DownloadError(f"Tamanho remoto de {url} ({size}) diferente do esperado ({expected_size})")
+
+    if is_ranged and size:
+        parts = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+        done = load_state(state_path, url, size, validator) or set()
+        if not done or not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            done = set()
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+
+        pending = [part for part in parts if part[0] not in done]
+        if done:
+            print(f"Retomando download de {os.path.basename(dest_path)}: {len(done)}/{len(parts)} partes prontas.")
+
+        lock = threading.Lock()
+
+        def fetch(part):
+            fetch_range(final_url, headers, part_path, *part)
+            with lock:
+                done.add(part[0])
+                save_state(state_path, url, size, validator, done)
+
+        with ThreadPoolExecutor(max(1, min(workers, len(pending) or 1))) as pool:
+            for future in [pool.submit(fetch, part) for part in pending]:
+                future.result()
+    else:
+        fetch_stream(final_url, headers, part_path, state_path, size, validator)
+
+    actual_size = os.path.getsize(part_path)
+    if (size is not None and actual_size != size) or (expected_size is not None and actual_size != expected_size):
+        raise DownloadError(f"Download de {url} incompleto: {actual_size} bytes")
+    if sha256 and not sha256_file(part_path).startswith(sha256.lower()):
+        os.remove(part_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        raise DownloadError(f"Checksum SHA-256 de {url} não confere")
+
+    os.replace(part_path, dest_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return dest_path
@@ -0,0 +1,243 @@
+# ingest.py
+import hashlib
+import os
+import re
+import subprocess
+import threading
+
+import soundfile as sf
+
+from lib_v5.audio_stream import AudioStream, STREAM_BLOCK_SIZE
+
+# --- CONFIGURAÇÕES ---
+# Decodifica o upload com o ffmpeg enquanto o corpo da requisição ainda está chegando.
+INGEST_DECODE = os.environ.get('INGEST_DECODE', '1') != '0'
+INGEST_DECODE_TIMEOUT = float(os.environ.get('INGEST_DECODE_TIMEOUT', 120))
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+DECODED_SUFFIX = '.f32'
+PARTIAL_SUFFIX = '.partial'
+DECODED_SAMPLERATE = 44100
+DECODED_CHANNELS = 2
+STREAM_INFO = re.compile(r'Audio: (\w+).*?, (\d+) Hz')
+
+# Decodificações ainda em andamento neste processo, por caminho do .f32 (ver `wait_decoded`).
+_pending_decodes = {}
+_pending_lock = threading.Lock()
+
+# --- FUNÇÕES AUXILIARES ---
+def wait_decoded(decoded_path):
+    """
+    Espera a decodificação do upload terminar (se ainda estiver rodando neste
+    processo) e retorna True se o .f32 completo existe. O arquivo só aparece no
+    caminho final depois de decodificado inteiro, então após um restart basta
+    conferir se ele existe.
+    """
+    with _pending_lock:
+        decoder = _pending_decodes.pop(decoded_path, None)
+    if decoder is not None:
+        decoder.done.wait()
+    return os.path.exists(decoded_path)
+
+def open_decoded(decoded_path, block_size=STREAM_BLOCK_SIZE):
+    """Áudio decodificado pela ingestão como mix do job: lido do disco em blocos, sem carregar a faixa inteira."""
+    return AudioStream(decoded_path, DECODED_SAMPLERATE, block_size, raw=(DECODED_SAMPLERATE, DECODED_CHANNELS))
+
+class StreamingDecoder:
+    """
+    Processo ffmpeg que recebe o arquivo pelo stdin, pedaço a pedaço, e
+    grava PCM float32 estéreo intercalado a 44.1 kHz à medida que decodifica.
+    A saída vai para `decoded_path` + PARTIAL_SUFFIX e só é renomeada para
+    `decoded_path` quando a decodificação termina sem erro. Formato e
+    samplerate de origem são lidos do stderr assim que o ffmpeg termina de
+    sondar o início do arquivo.
+
+    Formatos que o ffmpeg não consegue ler de um pipe (p.ex. MP4 com o moov
+    no fim) apenas falham; o job então decodifica o arquivo normalmente.
+    """
+
+    def __init__(self, decoded_path):
+        self.decoded_path = decoded_path
+        self.partial_path = decoded_path + PARTIAL_SUFFIX
+        self.done = threading.Event()
+        self.format = None
+        self.samplerate = None
+        self.frames = 0
+        self.failed = False
+        self._stderr = []
+        self._proc = subprocess.Popen(
+            [FFMPEG_BINARY, '-hide_banner', '-i', 'pipe:0', '-f', 'f32le', '-ar', str(DECODED_SAMPLERATE),
+             '-ac', str(DECODED_CHANNELS), 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._threads = [threading.Thread(target=self._read_output, daemon=True),
+                         threading.Thread(target=self._read_stderr, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def _read_output(self):
+        written = 0
+        with open(self.partial_path, 'wb') as f:
+            for chunk in iter(lambda: self._proc.stdout.read(1024 * 1024), b''):
+                f.write(chunk)
+                written += len(chunk)
+        self.frames = written // (4 * DECODED_CHANNELS)
+
+    def _read_stderr(self):
+        for line in iter(self._proc.stderr.readline, b''):
+            line = line.decode(errors='ignore')
+            self._stderr.append(line)
+            match = self.format is None and STREAM_INFO.search(line)
+            if match:
+                self.format, self.samplerate = match.group(1), int(match.group(2))
+
+    def feed(self, data):
+        if self.failed:
+            return
+        try:
+            self._proc.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            self.failed = True
+
+    def kill(self):
+        self.failed = True
+        self._proc.kill()
+        for thread in self._threads:
+            thread.join()
+        self._remove_outputs()
+        self.done.set()
+
+    def _remove_outputs(self):
+        for path in (self.partial_path, self.decoded_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finish_async(self):
+        """Fecha o stdin e deixa o fim da decodificação para uma thread; o job espera por `wait_decoded`."""
+        with _pending_lock:
+            _pending_decodes[self.decoded_path] = self
+        threading.Thread(target=self.finish, daemon=True).start()
+
+    def finish(self):
+        """Fecha o stdin e espera o fim da decodificação. Retorna True se o arquivo foi decodificado inteiro."""
+        try:
+            return self._finish()
+        finally:
+            self.done.set()
+
+    def _finish(self):
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            self.failed = True
+        try:
+            returncode = self._proc.wait(timeout=INGEST_DECODE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            returncode = -1
+        for thread in self._threads:
+            thread.join()
+
+        if returncode != 0 or self.failed or not self.frames:
+            self.failed = True
+            print(f"Ingestão: ffmpeg não decodificou o upload ({returncode}): {''.join(self._stderr[-3:]).strip()}")
+            self._remove_outputs()
+        else:
+            try:
+                os.replace(self.partial_path, self.decoded_path)
+            except OSError:
+                # Arquivos do job já limpos (ex.: resultado servido do cache).
+                self.failed = True
+        return not self.failed
+
+class UploadIngest:
+    """
+    Destino do upload usado no lugar do arquivo temporário do werkzeug
+    (`Request._get_file_stream`). Os bytes vão direto para `path` enquanto
+    são contados e passam pelo SHA-256 e, com INGEST_DECODE, pelo
+    `StreamingDecoder`, de modo que a decodificação acontece junto com o upload.
+    """
+
+    def __init__(self, path, is_decode=INGEST_DECODE):
+        self.path = path
+        self.size = 0
+        self._file = open(path, 'w+b')
+        self._sha256 = hashlib.sha256()
+        self.decoder = None
+        if is_decode:
+            try:
+                self.decoder = StreamingDecoder(path + DECODED_SUFFIX)
+            except OSError as e:
+                print(f"Ingestão: decodificação em streaming indisponível: {e}")
+
+    def write(self, data):
+        self._file.write(data)
+        self._sha256.update(data)
+        self.size += len(data)
+        if self.decoder is not None:
+            self.decoder.feed(data)
+        return len(data)
+
+    # Interface de arquivo esperada pelo werkzeug/FileStorage.
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        """Descarta o upload (requisição rejeitada): encerra o ffmpeg e apaga os arquivos."""
+        self._file.close()
+        if self.decoder is not None:
+            self.decoder.kill()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def finish(self):
+        """
+        Fecha o upload e retorna o que foi apurado na ingestão: sha256, tamanho,
+        formato, samplerate, duração e o caminho do áudio decodificado. Não
+        espera o ffmpeg: o fim da decodificação fica em segundo plano e o job
+        espera por ele com `wait_decoded` antes de abrir o .f32.
+        """
+        self._file.flush()
+        self._file.close()
+        info = {'audio_sha256': self._sha256.hexdigest(), 'audio_bytes': self.size,
+                'audio_format': None, 'audio_samplerate': None, 'audio_seconds': None, 'decoded_path': None}
+
+        if self.decoder is not None and not self.decoder.failed:
+            info['audio_format'], info['audio_samplerate'] = self.decoder.format, self.decoder.samplerate
+            info['decoded_path'] = self.decoder.decoded_path
+            self.decoder.finish_async()
+        elif self.decoder is not None:
+            self.decoder.kill()
+
+        # Só o cabeçalho; formatos que o libsndfile não lê ficam sem duração (ETA usa a média).
+        try:
+            probe = sf.info(self.path)
+            info['audio_format'] = info['audio_format'] or probe.format
+            info['audio_samplerate'] = info['audio_samplerate'] or probe.samplerate
+            info['audio_seconds'] = round(probe.duration, 3)
+        except Exception:
+            pass
+        return info
@@ -0,0 +1,217 @@
+# job_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+# --- CONFIGURAÇÕES ---
+JOB_QUEUE_DB = os.environ.get('JOB_QUEUE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+JOB_MIN_FREE_MEMORY_MB = int(os.environ.get('JOB_MIN_FREE_MEMORY_MB', 2048))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+JOB_DEFAULT_SECONDS = float(os.environ.get('JOB_DEFAULT_SECONDS', 60))
+ETA_HISTORY = 20
+
+QUEUED = 'queued'
+PROCESSING = 'processing'
+COMPLETE = 'complete'
+ERROR = 'error'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    files TEXT NOT NULL DEFAULT '[]',
+    error_message TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    audio_seconds REAL
+)
+"""
+
+# --- FUNÇÕES AUXILIARES ---
+def free_device_memory_mb():
+    """Memória livre do device de inferência (VRAM com CUDA, RAM caso contrário)."""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            free, _ = torch.cuda.mem_get_info()
+            return free / 1024**2
+    except Exception:
+        pass
+
+    import psutil
+    return psutil.virtual_memory().available / 1024**2
+
+class JobQueue:
+    """
+    Fila de jobs persistente em SQLite. O estado de cada job sobrevive a um
+    reinício do processo; jobs que estavam em execução voltam para a fila.
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_DB):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(SCHEMA)
+            # Bancos criados antes da coluna audio_seconds.
+            columns = [row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')]
+            if 'audio_seconds' not in columns:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN audio_seconds REAL')
+        self.available = threading.Condition()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def recover(self):
+        """Recoloca na fila os jobs interrompidos por um reinício."""
+        count = self._execute('UPDATE jobs SET status = ?, progress = 0, started_at = NULL WHERE status = ?',
+                              (QUEUED, PROCESSING)).rowcount
+        if count:
+            print(f"{count} job(s) interrompido(s) recolocado(s) na fila.")
+        return count
+
+    def enqueue(self, job_id, payload, audio_seconds=None):
+        self._execute('INSERT INTO jobs (id, status, payload, created_at, audio_seconds) VALUES (?, ?, ?, ?, ?)',
+                      (job_id, QUEUED, json.dumps(payload), time.time(), audio_seconds))
+        with self.available:
+            self.available.notify()
+
+    def claim(self):
+        """Marca o job mais antigo da fila como em execução e retorna (job_id, payload)."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT id, payload FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1',
+                                         (QUEUED,)).fetchone()
+                if row:
+                    self._conn.execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?',
+                                       (PROCESSING, time.time(), row['id']))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return (row['id'], json.loads(row['payload'])) if row else None
+
+    def has_queued(self):
+        return self._execute('SELECT 1 FROM jobs WHERE status = ? LIMIT 1', (QUEUED,)).fetchone() is not None
+
+    def running_count(self):
+        return self._execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (PROCESSING,)).fetchone()[0]
+
+    def update_progress(self, job_id, progress):
+        self._execute('UPDATE jobs SET progress = ? WHERE id = ? AND progress < ?', (progress, job_id, progress))
+
+    def complete(self, job_id, files):
+        self._execute('UPDATE jobs SET status = ?, progress = 100, files = ?, finished_at = ? WHERE id = ?',
+                      (COMPLETE, json.dumps(files), time.time(), job_id))
+
+    def fail(self, job_id, error_message):
+        self._execute('UPDATE jobs SET status = ?, error_message = ?, finished_at = ? WHERE id = ?',
+                      (ERROR, error_message, time.time(), job_id))
+
+    def delete(self, job_id):
+        self._execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def average_job_seconds(self):
+        rows = self._execute('SELECT finished_at - started_at FROM jobs WHERE status = ? AND started_at IS NOT NULL '
+                             'ORDER BY finished_at DESC LIMIT ?', (COMPLETE, ETA_HISTORY)).fetchall()
+        return sum(r[0] for r in rows) / len(rows) if rows else JOB_DEFAULT_SECONDS
+
+    def seconds_per_audio_second(self):
+        """Tempo de processamento por segundo de áudio nos últimos jobs com duração conhecida."""
+        rows = self._execute('SELECT finished_at - started_at, audio_seconds FROM jobs WHERE status = ? AND started_at IS NOT NULL '
+                             'AND audio_seconds > 0 ORDER BY finished_at DESC LIMIT ?', (COMPLETE, ETA_HISTORY)).fetchall()
+        return sum(r[0] for r in rows) / sum(r[1] for r in rows) if rows else None
+
+    def estimate_seconds(self, audio_seconds, average=None, rate=None):
+        """Duração estimada de um job: pela duração do áudio quando conhecida, senão pela média."""
+        if audio_seconds and rate:
+            return rate * audio_seconds
+        return average if average is not None else self.average_job_seconds()
+
+    def status(self, job_id, workers=JOB_WORKERS):
+        """Estado do job no formato do endpoint /status, com posição na fila e ETA em segundos."""
+        row = self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = {'status': row['status'], 'progress': row['progress'], 'files': json.loads(row['files'])}
+        if row['error_message']:
+            job['error_message'] = row['error_message']
+
+        average, rate = self.average_job_seconds(), self.seconds_per_audio_second()
+        estimate = lambda audio_seconds: self.estimate_seconds(audio_seconds, average, rate)
+        if row['status'] == PROCESSING:
+            elapsed = time.time() - row['started_at']
+            job['eta_seconds'] = round(max(estimate(row['audio_seconds']) - elapsed, 0), 1)
+        elif row['status'] == QUEUED:
+            ahead = self._execute('SELECT audio_seconds FROM jobs WHERE status = ? AND created_at <= ?',
+                                  (QUEUED, row['created_at'])).fetchall()
+            running = self._execute('SELECT started_at, audio_seconds FROM jobs WHERE status = ?', (PROCESSING,)).fetchall()
+            running_left = sum(max(estimate(r[1]) - (time.time() - r[0]), 0) for r in running)
+            job['queue_position'] = len(ahead)
+            job['eta_seconds'] = round((running_left + sum(estimate(r[0]) for r in ahead)) / max(workers, 1), 1)
+        return job
+
+class WorkerPool:
+    """
+    Pool fixo de workers que consomem a `JobQueue`. Antes de iniciar um job,
+    cada worker espera haver `min_free_memory_mb` livres no device, a não ser
+    que nenhum outro job esteja rodando.
+    """
+
+    def __init__(self, queue, run_job, workers=JOB_WORKERS, min_free_memory_mb=JOB_MIN_FREE_MEMORY_MB):
+        self.queue = queue
+        self.run_job = run_job
+        self.workers = workers
+        self.min_free_memory_mb = min_free_memory_mb
+        self._admission_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Inicia os workers; chamadas seguintes não fazem nada."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self.queue.recover()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'separation-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _admit(self):
+        while True:
+            with self._admission_lock:
+                if self.queue.running_count() == 0 or free_device_memory_mb() >= self.min_free_memory_mb:
+                    return self.queue.claim()
+            time.sleep(JOB_POLL_INTERVAL)
+
+    def _worker_loop(self):
+        while True:
+            with self.queue.available:
+                if not self.queue.has_queued():
+                    self.queue.available.wait(JOB_POLL_INTERVAL)
+                    continue
+
+            claimed = self._admit()
+            if claimed is None:
+                continue
+
+            job_id, payload = claimed
+            try:
+                files = self.run_job(job_id, payload)
+                self.queue.complete(job_id, files)
+            except Exception as e:
+                traceback.print_exc()
+                self.queue.fail(job_id, str(e))
@@ -0,0 +1,390 @@
+import audioread
+import numpy as np
+import soundfile as sf
+import tempfile
+import torch
+
+STREAM_BLOCK_SIZE = 44100 * 10
+RESAMPLE_TYPE = 'sinc_best'
+RESAMPLE_DRAIN = 4096
+
+ACCUMULATE_AUTO = 'auto'
+ACCUMULATE_HOST = 'host'
+ACCUMULATE_PINNED = 'pinned'
+ACCUMULATE_MEMMAP = 'memmap'
+
+RAW_FLOAT32 = {'format': 'RAW', 'subtype': 'FLOAT', 'endian': 'LITTLE'}
+
+def to_stereo(frames: np.ndarray):
+    """Converts a (frames, channels) block to (frames, 2)."""
+    if frames.ndim == 1 or frames.shape[1] == 1:
+        frames = frames.reshape(-1, 1)
+        return np.repeat(frames, 2, axis=1)
+
+    return frames[:, :2]
+
+class AudioStream:
+    """
+    Lazily decodes an audio file into fixed-size stereo float32 blocks of shape
+    (2, block_size), resampled to `samplerate` on the fly. The file is decoded
+    again every time the stream is iterated, so only one block is resident at
+    a time.
+
+    `raw` is (samplerate, channels) for a headerless little-endian float32 PCM
+    file, such as the upload decoded by the API ingest.
+    """
+
+    def __init__(self, path, samplerate=44100, block_size=STREAM_BLOCK_SIZE, raw=None):
+        self.path = path
+        self.samplerate = samplerate
+        self.block_size = block_size
+        self.raw_format = dict(RAW_FLOAT32, samplerate=raw[0], channels=raw[1]) if raw else {}
+
+        try:
+            with sf.SoundFile(path, **self.raw_format) as f:
+                self.source_samplerate, self.source_frames, self.is_soundfile = f.samplerate, f.frames, True
+        except Exception:
+            with audioread.audio_open(path) as f:
+                self.source_samplerate, self.is_soundfile = f.samplerate, False
+                self.source_frames = int(f.duration * f.samplerate)
+
+    @property
+    def length(self):
+        """Estimated number of frames at the target samplerate."""
+        return int(round(self.source_frames * self.samplerate / self.source_samplerate))
+
+    def _source_blocks(self):
+        if self.is_soundfile:
+            for block in sf.blocks(self.path, blocksize=self.block_size, dtype='float32', always_2d=True, **self.raw_format):
+                yield block
+        else:
+            with audioread.audio_open(self.path) as f:
+                for buf in f:
+                    yield (np.frombuffer(buf, dtype='<i2').astype(np.float32) / 32768.0).reshape(-1, f.channels)
+
+    def _resampled_blocks(self):
+        ratio = self.samplerate / self.source_samplerate
+
+        if ratio == 1:
+            for block in self._source_blocks():
+                yield to_stereo(block)
+            return
+
+        import samplerate
+
+        # Each block is held back by one so the last one can be sent with end_of_input,
+        # followed by enough silence to drain the filter delay.
+        resampler = samplerate.Resampler(RESAMPLE_TYPE, channels=2)
+        previous, frames_in, frames_out = None, 0, 0
+
+        for block in self._source_blocks():
+            if previous is not None:
+                out = resampler.process(previous, ratio, end_of_input=False)
+                frames_out += len(out)
+                yield out
+            previous = np.ascontiguousarray(to_stereo(block))
+            frames_in += len(previous)
+
+        if previous is not None:
+            tail = np.concatenate((previous, np.zeros((RESAMPLE_DRAIN, 2), dtype=previous.dtype)))
+            out = resampler.process(tail, ratio, end_of_input=True)
+            yield out[:max(0, int(round(frames_in * ratio)) - frames_out)]
+
+    def __iter__(self):
+        pending, pending_len = [], 0
+
+        for block in self._resampled_blocks():
+            pending.append(block)
+            pending_len += len(block)
+
+            if pending_len >= self.block_size:
+                data = np.concatenate(pending)
+                for start in range(0, len(data) - self.block_size + 1, self.block_size):
+                    yield np.ascontiguousarray(data[start:start + self.block_size].T, dtype=np.float32)
+                rest = data[len(data) - len(data) % self.block_size:]
+                pending, pending_len = [rest], len(rest)
+
+        if pending_len:
+            yield np.ascontiguousarray(np.concatenate(pending).T, dtype=np.float32)
+
+    def load(self):
+        """Decodes the whole stream into a single preallocated (2, n) float32 array."""
+        mix = np.zeros((2, self.length + self.block_size), dtype=np.float32)
+        length = 0
+
+        for block in self:
+            end = length + block.shape[-1]
+            if end > mix.shape[-1]:
+                mix = np.concatenate((mix, np.zeros((2, end - mix.shape[-1] + self.block_size), dtype=np.float32)), 1)
+            mix[:, length:end] = block
+            length = end
+
+        return mix[:, :length]
+
+    def subtract(self, source: np.ndarray):
+        """Returns `mix - source` for a (2, n) source, reading the mix block by block."""
+        inverted = np.empty_like(source, dtype=np.float32)
+        offset = 0
+
+        for block in self:
+            end = min(offset + block.shape[-1], source.shape[-1])
+            inverted[:, offset:end] = block[:, :end - offset] - source[:, offset:end]
+            offset = end
+            if offset >= source.shape[-1]:
+                break
+
+        inverted[:, offset:] = -source[:, offset:]
+
+        return inverted
+
+def iter_blocks(mix, block_size=STREAM_BLOCK_SIZE):
+    if isinstance(mix, AudioStream):
+        yield from mix
+    else:
+        for start in range(0, mix.shape[-1], block_size):
+            yield mix[..., start:start + block_size]
+
+class SlidingWindows:
+    """
+    Streaming equivalent of `unfold` over `[zeros(pad_left) | mix | zeros(pad_right(n))]`.
+
+    Yields (offset, window) pairs where `offset` is the window start in padded
+    coordinates and `window` is a (channels, chunk_size) float32 array. Only
+    about one chunk of input is kept in memory. `length` holds the number of
+    mix frames consumed so far and is final once iteration ends.
+    """
+
+    def __init__(self, mix, chunk_size, step, pad_left=0, pad_right=lambda length: 0, block_size=STREAM_BLOCK_SIZE):
+        self.mix = mix
+        self.chunk_size = chunk_size
+        self.step = step
+        self.pad_left = pad_left
+        self.pad_right = pad_right
+        self.block_size = block_size
+        self.length = mix.length if isinstance(mix, AudioStream) else mix.shape[-1]
+        self.is_length_final = not isinstance(mix, AudioStream)
+
+    def padded_length(self):
+        return self.pad_left + self.length + self.pad_right(self.length)
+
+    def total_windows(self):
+        return max(0, (self.padded_length() - self.chunk_size) // self.step + 1)
+
+    def __iter__(self):
+        buffer = np.zeros((2, self.pad_left), dtype=np.float32)
+        buffer_start, offset, length = 0, 0, 0
+
+        for block in iter_blocks(self.mix, self.block_size):
+            length += block.shape[-1]
+            buffer = np.concatenate((buffer, block.astype(np.float32, copy=False)), 1)
+
+            while offset + self.chunk_size <= buffer_start + buffer.shape[-1]:
+                yield offset, buffer[:, offset - buffer_start:offset - buffer_start + self.chunk_size]
+                offset += self.step
+
+            buffer, buffer_start = buffer[:, offset - buffer_start:], offset
+
+        self.length, self.is_length_final = length, True
+        buffer = np.concatenate((buffer, np.zeros((2, self.pad_right(length)), dtype=np.float32)), 1)
+
+        while offset + self.chunk_size <= buffer_start + buffer.shape[-1]:
+            yield offset, buffer[:, offset - buffer_start:offset - buffer_start + self.chunk_size]
+            offset += self.step
+
+class HostSink:
+    """Keeps flushed regions as a list of host arrays and concatenates them at the end."""
+
+    def __init__(self):
+        self.pieces = []
+
+    def write(self, start, frames: torch.Tensor):
+        self.pieces.append((start, frames.cpu().numpy()))
+
+    def result(self, start, length):
+        pieces = []
+
+        for piece_start, piece in self.pieces:
+            lo, hi = max(start, piece_start), min(start + length, piece_start + piece.shape[-1])
+            if hi > lo:
+                pieces.append(piece[..., lo - piece_start:hi - piece_start])
+
+        self.pieces = []
+
+        return np.concatenate(pieces, -1)
+
+class PreallocatedSink:
+    """
+    Writes flushed regions into one preallocated output of `length` frames,
+    growing it if the stream turns out longer than estimated. `result` returns
+    a view, so the output is never copied a second time.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.buffer = None
+
+    def _allocate(self, shape):
+        raise NotImplementedError
+
+    def _grow(self, end):
+        old, self.length = self.buffer, max(end, int(self.length * 1.25))
+        self.buffer = self._allocate((*old.shape[:-1], self.length))
+        self.buffer[..., :old.shape[-1]] = old[..., :]
+
+    def _store(self, start, frames):
+        raise NotImplementedError
+
+    def write(self, start, frames: torch.Tensor):
+        end = start + frames.shape[-1]
+        if self.buffer is None:
+            self.length = max(self.length, end)
+            self.buffer = self._allocate((*frames.shape[:-1], self.length))
+        elif end > self.length:
+            self._grow(end)
+
+        self._store(start, frames)
+
+    def view(self, start, length):
+        return self.buffer[..., start:start + length]
+
+class PinnedSink(PreallocatedSink):
+    """Preallocated page-locked host tensor; device-to-host copies are asynchronous."""
+
+    def _allocate(self, shape):
+        return torch.zeros(shape, dtype=torch.float32, pin_memory=torch.cuda.is_available())
+
+    def _grow(self, end):
+        # Earlier asynchronous device-to-host copies into the old buffer must land before it is copied.
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        super()._grow(end)
+
+    def _store(self, start, frames):
+        self.buffer[..., start:start + frames.shape[-1]].copy_(frames, non_blocking=True)
+
+    def result(self, start, length):
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return self.view(start, length).numpy()
+
+class MemmapSink(PreallocatedSink):
+    """Preallocated memory-mapped temporary file, for outputs that should not stay in RAM."""
+
+    def __init__(self, length, directory=None):
+        super().__init__(length)
+        self.directory = directory
+
+    def _allocate(self, shape):
+        # The mapping outlives the (already unlinked) temporary file.
+        return np.memmap(tempfile.TemporaryFile(dir=self.directory), dtype=np.float32, mode='w+', shape=shape)
+
+    def _store(self, start, frames):
+        self.buffer[..., start:start + frames.shape[-1]] = frames.cpu().numpy()
+
+    def result(self, start, length):
+        return self.view(start, length)
+
+def make_sink(mode, length, device='cpu', directory=None):
+    if mode == ACCUMULATE_AUTO:
+        mode = ACCUMULATE_PINNED if str(device).startswith('cuda') else ACCUMULATE_HOST
+
+    if mode == ACCUMULATE_PINNED:
+        return PinnedSink(length)
+    if mode == ACCUMULATE_MEMMAP:
+        return MemmapSink(length, directory)
+
+    return HostSink()
+
+class OverlapAdd:
+    """
+    Accumulates overlapping model outputs in a fixed-size ring buffer on `device`.
+
+    Windows must be added in increasing offset order. Regions before the next
+    window start are final and are flushed to `sink` (host list, pinned host
+    memory or a memory-mapped file), so device memory is bounded by `capacity`
+    frames regardless of the track length. When `divisor` is given, the sum is
+    divided by that constant instead of the accumulated window.
+    """
+
+    def __init__(self, chunk_size, window=None, divisor=None, device='cpu', capacity=None, sink=None):
+        self.chunk_size = chunk_size
+        self.window = window
+        self.divisor = divisor
+        self.device = device
+        self.capacity = max(capacity or 0, chunk_size)
+        self.sink = sink if sink is not None else HostSink()
+        self.buffer = None
+        self.weight = None
+        self.buffer_start = 0
+        self.buffer_end = 0
+
+    def _ring_slices(self, start, count):
+        """Splits [start, start + count) into (ring_lo, ring_hi, relative_lo) slices."""
+        ring_start = start % self.capacity
+        first = min(count, self.capacity - ring_start)
+        slices = [(ring_start, ring_start + first, 0)]
+        if first < count:
+            slices.append((0, count - first, first))
+        return slices
+
+    def _reserve(self, lead_shape, end):
+        needed = end - self.buffer_start
+        if self.buffer is not None and needed <= self.capacity:
+            return
+
+        # The first batch allocates the ring; a larger batch than expected reallocates it once.
+        live = self._read(self.buffer_start, self.buffer_end - self.buffer_start) if self.buffer is not None else None
+        self.capacity = max(self.capacity, needed)
+        self.buffer = torch.zeros((*lead_shape, self.capacity), dtype=torch.float32, device=self.device)
+        self.weight = torch.zeros(self.capacity, dtype=torch.float32, device=self.device)
+
+        if live is not None:
+            for lo, hi, rel in self._ring_slices(self.buffer_start, live[0].shape[-1]):
+                self.buffer[..., lo:hi] = live[0][..., rel:rel + hi - lo]
+                self.weight[lo:hi] = live[1][rel:rel + hi - lo]
+
+    def _read(self, start, count):
+        slices = self._ring_slices(start, count)
+        buffer = torch.cat([self.buffer[..., lo:hi] for lo, hi, _ in slices], -1)
+        weight = torch.cat([self.weight[lo:hi] for lo, hi, _ in slices])
+        return buffer, weight
+
+    def add(self, offsets, frames: torch.Tensor):
+        """Adds a batch of (batch, ..., chunk_size) outputs starting at `offsets`."""
+        frames = frames[..., :self.chunk_size]
+        end = offsets[-1] + self.chunk_size
+        self._reserve(frames.shape[1:-1], end)
+        self.buffer_end = max(self.buffer_end, end)
+
+        if self.window is not None:
+            frames = frames * self.window
+
+        positions = (torch.as_tensor(offsets, device=self.device)[:, None] + torch.arange(self.chunk_size, device=self.device)).flatten() % self.capacity
+        frames = frames.movedim(0, -2).reshape(*frames.shape[1:-1], -1)
+        self.buffer.index_add_(self.buffer.ndim - 1, positions, frames)
+
+        if self.divisor is None:
+            self.weight.index_add_(0, positions, self.window.repeat(len(offsets)) if self.window is not None else torch.ones(len(positions), device=self.device))
+
+    def flush(self, until):
+        """Moves the finished region before `until` (padded coordinates) to the sink."""
+        count = min(until, self.buffer_end) - self.buffer_start
+        if self.buffer is None or count <= 0:
+            return
+
+        buffer, weight = self._read(self.buffer_start, count)
+        weight = self.divisor if self.divisor is not None else weight.clamp(min=1e-8)
+        self.sink.write(self.buffer_start, buffer / weight)
+
+        for lo, hi, _ in self._ring_slices(self.buffer_start, count):
+            self.buffer[..., lo:hi] = 0
+            self.weight[lo:hi] = 0
+
+        self.buffer_start += count
+
+    def result(self, start, length):
+        """Returns the finished output between `start` and `start + length`."""
+        self.flush(self.buffer_end)
+        self.buffer = self.weight = None
+
+        return self.sink.result(start, length)
@@ -0,0 +1,102 @@
+import threading
+
+import torch
+import torch.nn as nn
+
+from lib_v5.precision import DEFAULT_MIN_SDR_DB, sdr
+
+COMPILE_OFF = 'off'
+COMPILE_TRACE = 'trace'
+COMPILE_TORCH = 'compile'
+COMPILE_MODES = (COMPILE_OFF, COMPILE_TRACE, COMPILE_TORCH)
+
+MAX_TRACED_SHAPES = 8
+TRACE_RTOL, TRACE_ATOL = 1e-3, 1e-4
+
+def autocast_dtype(device_type):
+    return str(torch.get_autocast_dtype(device_type)) if torch.is_autocast_enabled(device_type) else None
+
+class _EagerForward(nn.Module):
+    """Module whose forward is the original (eager) forward of `module`, so it can be traced and saved."""
+
+    def __init__(self, module, forward):
+        super().__init__()
+        self.module = module
+        self.eager_forward = forward
+
+    def forward(self, x):
+        return self.eager_forward(x)
+
+class TracedForward:
+    """
+    Replacement for a module's `forward` that runs TorchScript graphs traced
+    per input shape (segment and batch size), dtype and autocast dtype. Graphs
+    are obtained through `cache_artifact(shape_key, build)`, which returns the
+    path of a saved graph, calling `build(path)` to trace and save it when
+    there is none yet (or None when there is no cache).
+
+    A graph is only used if its output matched the eager forward when it was
+    traced; shapes that fail to trace, and shapes beyond MAX_TRACED_SHAPES,
+    run the eager forward.
+    """
+
+    def __init__(self, module, cache_artifact):
+        self.eager = module.forward
+        self.wrapper = _EagerForward(module, self.eager)
+        self.cache_artifact = cache_artifact
+        self.graphs = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, x):
+        key = (tuple(x.shape), str(x.dtype), x.device.type, autocast_dtype(x.device.type))
+        graph = self.graphs.get(key)
+        if graph is None and key not in self.graphs:
+            with self._lock:
+                if key not in self.graphs:
+                    self.graphs[key] = self._graph(key, x) if len(self.graphs) < MAX_TRACED_SHAPES else None
+                graph = self.graphs[key]
+        return self.eager(x) if graph is None else graph(x)
+
+    def _trace(self, x):
+        with torch.no_grad():
+            graph = torch.jit.freeze(torch.jit.trace(self.wrapper.eval(), x, check_trace=False))
+            expected, actual = self.eager(x).float(), graph(x).float()
+        # Under autocast the traced graph rounds differently from eager; it is held to the precision gate instead.
+        if autocast_dtype(x.device.type) is None:
+            matches = torch.allclose(expected, actual, rtol=TRACE_RTOL, atol=TRACE_ATOL)
+        else:
+            matches = sdr(expected.cpu(), actual.cpu()) >= DEFAULT_MIN_SDR_DB
+        if not matches:
+            raise RuntimeError('traced output differs from eager output')
+        return graph
+
+    def _graph(self, key, x):
+        traced = {}
+
+        def build(path):
+            traced['graph'] = None
+            traced['graph'] = self._trace(x)
+            torch.jit.save(traced['graph'], path)
+
+        try:
+            path = self.cache_artifact(key, build)
+            # A failed build has already been reported by the cache; it is not traced again.
+            if 'graph' in traced:
+                return traced['graph']
+            if path is not None:
+                return torch.jit.load(path, map_location=x.device)
+            return self._trace(x)
+        except Exception as e:
+            print(f'Tracing failed for input {key[0]}, running eager: {e}')
+            return None
+
+def compile_forward(module: nn.Module, mode, cache_artifact=None):
+    """
+    Swaps `module.forward` for a traced (COMPILE_TRACE) or torch.compile'd
+    (COMPILE_TORCH) version. The module object, and its attributes, stay the same.
+    """
+    if mode == COMPILE_TRACE:
+        module.forward = TracedForward(module, cache_artifact)
+    elif mode == COMPILE_TORCH:
+        module.forward = torch.compile(module.forward, dynamic=False)
+    return module
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import platform
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+DEVICE_PROVIDERS = {'cuda': 'CUDAExecutionProvider'}
+CPU_PROVIDERS = ['CPUExecutionProvider']
+
+def available_cores():
+    """Cores usable by this process: CPU affinity, capped by the cgroup v2 CPU quota (containers)."""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+def cpu_signature():
+    """Architecture plus a hash of the CPU feature flags: ORT_ENABLE_ALL graphs (NCHWc layouts) are ISA-specific."""
+    flags = ''
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            flags = next((line for line in f if line.startswith(('flags', 'Features'))), '')
+    except OSError:
+        pass
+    return f"{platform.machine()}-{hashlib.md5(flags.encode('utf-8')).hexdigest()[:8]}"
+
+def cpu_session_options(threads, optimized_model_path=None, is_optimized=False):
+    """
+    SessionOptions for CPU inference: `threads` intra-op threads, no inter-op
+    parallelism (the MDX graphs are a single chain). `optimized_model_path`
+    makes ORT serialize the fully optimized graph there; `is_optimized` is for
+    loading such a graph again without re-running the optimizers.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL if is_optimized else ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if optimized_model_path:
+        options.optimized_model_filepath = optimized_model_path
+    return options
+
+def optimize_onnx_model(model_path, optimized_model_path):
+    """Writes the ORT_ENABLE_ALL optimized graph of `model_path` for the CPU provider to `optimized_model_path`."""
+    import onnxruntime as ort
+
+    ort.InferenceSession(model_path, sess_options=cpu_session_options(1, optimized_model_path), providers=CPU_PROVIDERS)
+
+def create_cpu_sessions(model_path, count, threads, is_optimized=False):
+    """`count` independent CPU sessions, each with its own pool of `threads` intra-op threads."""
+    import onnxruntime as ort
+
+    return [ort.InferenceSession(model_path, sess_options=cpu_session_options(threads, is_optimized=is_optimized), providers=CPU_PROVIDERS)
+            for _ in range(count)]
+
+class OrtEngine:
+    """
+    Runs an ONNX Runtime session on torch tensors through IO binding. The
+    input tensor's memory is bound directly and the output is written into a
+    preallocated torch tensor that is reused for every call with the same
+    input shape, so no numpy round-trip happens per chunk and, on CUDA, the
+    data never leaves the device.
+
+    The returned tensor is that reused buffer: it is only valid until the next
+    call with the same shape. Create one engine per separation (the session
+    itself can be shared); the buffers are not safe to share between threads.
+    """
+
+    def __init__(self, session, device='cpu'):
+        self.session = session
+        self.device = torch.device(device)
+        self.input_name = session.get_inputs()[0].name
+        self.output_name = session.get_outputs()[0].name
+        self.output_dims = session.get_outputs()[0].shape
+
+        # Falls back to host buffers when the session cannot run on the tensors' device
+        # (e.g. CPU-only onnxruntime with a CUDA device).
+        provider = DEVICE_PROVIDERS.get(self.device.type)
+        self.bind_device = self.device if provider in session.get_providers() else torch.device('cpu')
+        self.bind_device_id = self.bind_device.index or 0
+        self.buffers = {}
+
+    def output_shape(self, input_shape):
+        # Symbolic/dynamic dims take the input's size on the same axis.
+        if len(self.output_dims) != len(input_shape):
+            return None
+        return tuple(dim if isinstance(dim, int) and dim > 0 else input_shape[i] for i, dim in enumerate(self.output_dims))
+
+    def output_buffer(self, input_shape):
+        if input_shape not in self.buffers:
+            shape = self.output_shape(input_shape)
+            self.buffers[input_shape] = None if shape is None else torch.empty(shape, dtype=torch.float32, device=self.bind_device)
+        return self.buffers[input_shape]
+
+    def synchronize(self):
+        # ORT runs on its own CUDA stream: the kernels that filled the bound input (or
+        # will read the output) are queued on torch's current stream.
+        if self.bind_device.type == 'cuda':
+            torch.cuda.current_stream(self.bind_device).synchronize()
+
+    def __call__(self, spek: torch.Tensor):
+        spek = spek.to(self.bind_device, dtype=torch.float32).contiguous()
+        self.synchronize()
+        binding = self.session.io_binding()
+        binding.bind_input(self.input_name, self.bind_device.type, self.bind_device_id, np.float32, tuple(spek.shape), spek.data_ptr())
+
+        output = self.output_buffer(tuple(spek.shape))
+        if output is None:
+            # Output rank unknown ahead of time: let ORT allocate on the bound device.
+            binding.bind_output(self.output_name, self.bind_device.type, self.bind_device_id)
+            self.session.run_with_iobinding(binding)
+            result = torch.from_numpy(binding.copy_outputs_to_cpu()[0])
+        else:
+            binding.bind_output(self.output_name, self.bind_device.type, self.bind_device_id, np.float32, tuple(output.shape), output.data_ptr())
+            self.session.run_with_iobinding(binding)
+            binding.synchronize_outputs()
+            result = output
+
+        return result.to(self.device)
+
+    def clear(self):
+        self.buffers.clear()
+
+class OrtParallelEngine:
+    """
+    Runs the chunks of a batch concurrently on several sessions (ORT releases
+    the GIL during inference), one `OrtEngine` per session. With one session,
+    or a batch of one chunk, it is a plain `OrtEngine` call.
+    """
+
+    def __init__(self, sessions, device='cpu'):
+        self.engines = [OrtEngine(session, device) for session in sessions]
+        self.pool = ThreadPoolExecutor(len(sessions), thread_name_prefix='ort') if len(sessions) > 1 else None
+
+    def __call__(self, spek: torch.Tensor):
+        if self.pool is None or spek.shape[0] == 1:
+            return self.engines[0](spek)
+
+        parts = spek.tensor_split(min(len(self.engines), spek.shape[0]))
+        # The engines return reused buffers, so the parts are gathered into a new tensor.
+        return torch.cat(list(self.pool.map(lambda run: run[0](run[1]), zip(self.engines, parts))))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        for engine in self.engines:
+            engine.clear()
@@ -0,0 +1,83 @@
+import contextlib
+import functools
+import math
+
+import torch
+
+FLOAT32 = 'float32'
+INFERENCE_DTYPES = {FLOAT32: torch.float32, 'bfloat16': torch.bfloat16, 'float16': torch.float16}
+DEFAULT_MIN_SDR_DB = 30.0
+PRECISION_REFERENCE_SECONDS = 10
+REFERENCE_RMS = 0.1
+SILENCE_RMS = 1e-4
+REFERENCE_CHORD_HZ = (110.0, 138.59, 164.81)
+
+def device_type(device):
+    return torch.device(device).type
+
+def inference_autocast(device, dtype_name=FLOAT32):
+    """Autocast context for the model forward pass; a no-op for float32."""
+    dtype = INFERENCE_DTYPES[dtype_name]
+    if dtype == torch.float32:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type(device), dtype=dtype)
+
+def to_float32(x):
+    if isinstance(x, torch.Tensor) and x.dtype in (torch.float16, torch.bfloat16):
+        return x.float()
+    return x
+
+def float32_only(fn):
+    """
+    Runs `fn` with autocast disabled and its half-precision tensor arguments
+    cast to float32. Used for the STFT/iSTFT around a reduced-precision
+    forward pass.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        args = [to_float32(arg) for arg in args]
+        tensor = next((arg for arg in args if isinstance(arg, torch.Tensor)), None)
+        if tensor is None or tensor.device.type not in ('cpu', 'cuda'):
+            return fn(*args, **kwargs)
+        with torch.autocast(tensor.device.type, enabled=False):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def sdr(reference: torch.Tensor, estimate: torch.Tensor, eps=1e-8):
+    """Signal-to-distortion ratio of `estimate` against `reference`, in dB."""
+    reference, estimate = reference.double(), estimate.double()
+    signal = (reference**2).sum()
+    distortion = ((reference - estimate)**2).sum()
+    return float(10 * torch.log10((signal + eps) / (distortion + eps)))
+
+def rms(x: torch.Tensor):
+    return float(x.double().pow(2).mean().sqrt())
+
+def reference_clip(shape, device='cpu', dtype=torch.float32, level=REFERENCE_RMS, samplerate=44100):
+    """
+    Fixed test clip of `shape` (..., channels, samples) at `level` RMS: a
+    harmonic chord with a pulsing envelope over seeded noise that differs per
+    channel. Gating on it instead of on the incoming track keeps the verdict
+    independent of which track comes first (a silent intro gives 0 dB).
+    """
+    t = torch.arange(shape[-1], dtype=torch.float64) / samplerate
+    tones = sum(torch.sin(2 * math.pi * f * h * t) / h for f in REFERENCE_CHORD_HZ for h in range(1, 6))
+    envelope = 0.6 + 0.4 * torch.cos(2 * math.pi * 2 * t)
+    noise = torch.randn(shape, generator=torch.Generator().manual_seed(0), dtype=torch.float64)
+    clip = tones * envelope + 0.5 * noise
+    return (clip * (level / rms(clip))).to(device=device, dtype=dtype)
+
+def compare_precision(run, reference, device, dtype_name):
+    """
+    Runs `run(reference)` in float32 and under `dtype_name` autocast and
+    returns the SDR (dB) of the reduced-precision output against the float32
+    one, i.e. how far the reduced precision moves the separated audio. Raises
+    ValueError when the float32 output is silent, since the SDR is then meaningless.
+    """
+    with torch.no_grad():
+        expected = run(reference).float().cpu()
+        if rms(expected) < SILENCE_RMS:
+            raise ValueError('float32 output is silent on the reference clip')
+        with inference_autocast(device, dtype_name):
+            actual = run(reference).float().cpu()
+    return sdr(expected, actual)
@@ -0,0 +1,124 @@
+import copy
+import time
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from lib_v5.precision import sdr
+
+DYNAMIC_QUANT_MODULES = {nn.Linear, nn.LSTM}
+
+class QuantizableMultiheadAttention(nn.Module):
+    """
+    Inference-only replacement for nn.MultiheadAttention with the q/k/v and
+    output projections as plain nn.Linear, so dynamic quantization reaches
+    them (nn.MultiheadAttention keeps the input projection as a bare parameter
+    and marks out_proj as non-quantizable). Attention weights are not returned.
+    """
+
+    def __init__(self, attention: nn.MultiheadAttention):
+        super().__init__()
+        self.embed_dim = attention.embed_dim
+        self.num_heads = attention.num_heads
+        self.head_dim = attention.head_dim
+        self.batch_first = attention.batch_first
+
+        if attention._qkv_same_embed_dim:
+            weights = attention.in_proj_weight.chunk(3)
+        else:
+            weights = (attention.q_proj_weight, attention.k_proj_weight, attention.v_proj_weight)
+        biases = attention.in_proj_bias.chunk(3) if attention.in_proj_bias is not None else (None,) * 3
+
+        self.q_proj, self.k_proj, self.v_proj = (self._linear(w, b) for w, b in zip(weights, biases))
+        self.out_proj = self._linear(attention.out_proj.weight, attention.out_proj.bias)
+
+    @staticmethod
+    def _linear(weight, bias):
+        linear = nn.Linear(weight.shape[1], weight.shape[0], bias=bias is not None)
+        linear.weight.data.copy_(weight.detach())
+        if bias is not None:
+            linear.bias.data.copy_(bias.detach())
+        return linear
+
+    @staticmethod
+    def is_supported(attention: nn.MultiheadAttention):
+        return attention.bias_k is None and not attention.add_zero_attn
+
+    def _heads(self, x):
+        # (length, batch, embed) -> (batch, heads, length, head_dim)
+        length, batch, _ = x.shape
+        return x.reshape(length, batch, self.num_heads, self.head_dim).permute(1, 2, 0, 3)
+
+    def forward(self, query, key, value, key_padding_mask=None, need_weights=False, attn_mask=None,
+                average_attn_weights=True, is_causal=False):
+        if self.batch_first:
+            query, key, value = (x.transpose(0, 1) for x in (query, key, value))
+        length, batch, _ = query.shape
+
+        mask = None
+        if attn_mask is not None:
+            # nn.MultiheadAttention: True = masked out; scaled_dot_product_attention: True = attend.
+            mask = attn_mask.logical_not() if attn_mask.dtype == torch.bool else attn_mask
+            if mask.dim() == 3:
+                mask = mask.reshape(batch, self.num_heads, *mask.shape[-2:])
+        if key_padding_mask is not None:
+            padding = key_padding_mask.logical_not() if key_padding_mask.dtype == torch.bool else key_padding_mask
+            padding = padding[:, None, None, :]
+            if mask is None:
+                mask = padding
+            elif mask.dtype == torch.bool and padding.dtype == torch.bool:
+                mask = mask & padding
+            else:
+                mask = _additive(mask, query.dtype) + _additive(padding, query.dtype)
+
+        q, k, v = self._heads(self.q_proj(query)), self._heads(self.k_proj(key)), self._heads(self.v_proj(value))
+        out = F.scaled_dot_product_attention(q, k, v, attn_mask=mask, is_causal=is_causal and mask is None)
+        out = self.out_proj(out.permute(2, 0, 1, 3).reshape(length, batch, self.embed_dim))
+
+        if self.batch_first:
+            out = out.transpose(0, 1)
+        return out, None
+
+def _additive(mask, dtype):
+    if mask.dtype != torch.bool:
+        return mask.to(dtype)
+    return torch.zeros(mask.shape, dtype=dtype, device=mask.device).masked_fill(~mask, float('-inf'))
+
+def replace_attention(model: nn.Module):
+    """Swaps every supported nn.MultiheadAttention in `model` for a QuantizableMultiheadAttention, in place."""
+    for name, child in list(model.named_children()):
+        if isinstance(child, nn.MultiheadAttention) and QuantizableMultiheadAttention.is_supported(child):
+            setattr(model, name, QuantizableMultiheadAttention(child))
+        else:
+            replace_attention(child)
+    return model
+
+def quantize_dynamic_int8(model: nn.Module):
+    """
+    CPU copy of `model` with its Linear and LSTM layers (attention projections
+    included) dynamically quantized to int8: weights are stored as int8,
+    activations are quantized per call. Convolutions stay in float32.
+    """
+    model = replace_attention(copy.deepcopy(model).cpu().eval())
+    return torch.ao.quantization.quantize_dynamic(model, DYNAMIC_QUANT_MODULES, dtype=torch.qint8)
+
+def benchmark_quantized(run_float, run_quantized, reference, repeats=3):
+    """
+    Times `run_float(reference)` against `run_quantized(reference)` (best of
+    `repeats`) and measures the SDR of the quantized output against float32.
+    """
+    def best_time(run):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = run(reference)
+            timings.append(time.perf_counter() - start)
+        return min(timings), output
+
+    with torch.no_grad():
+        float_seconds, expected = best_time(run_float)
+        quantized_seconds, actual = best_time(run_quantized)
+
+    return {'float32_seconds': float_seconds, 'int8_seconds': quantized_seconds,
+            'speedup': float_seconds / quantized_seconds, 'sdr_db': sdr(torch.as_tensor(expected).float(), torch.as_tensor(actual).float())}
@@ -6,7 +6,6 @@ import math
 import platform
 import traceback
 from . import pyrb
-from scipy.signal import correlate, hilbert
 import io
 
 OPERATING_SYSTEM = platform.system()
@@ -1033,6 +1032,8 @@ def align_audio(file1,
     save_format(file_subtracted)
 
 def phase_shift_hilbert(signal, degree):
+    from scipy.signal import hilbert
+
     analytic_signal = hilbert(signal)
     return np.cos(np.radians(degree)) * analytic_signal.real - np.sin(np.radians(degree)) * analytic_signal.imag
 
@@ -1052,6 +1053,7 @@ def get_phase_shifted_tracks(track, phase_shift):
 
 def time_correction(mix:np.ndarray, instrumental:np.ndarray, seconds_length, align_window, db_analysis, sr=44100, progress_bar=None, unique_sources=None, phase_shifts=NONE_P):
     # Function to align two tracks using cross-correlation
+    from scipy.signal import correlate
 
     def align_tracks(track1, track2):
         # A dictionary to store each version of track2_shifted and its mean absolute value
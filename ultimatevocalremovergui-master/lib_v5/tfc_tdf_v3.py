@@ -1,6 +1,7 @@
 import torch
 import torch.nn as nn
 from functools import partial
+from lib_v5.precision import float32_only
 
 class STFT:
     def __init__(self, n_fft, hop_length, dim_f, device):
@@ -10,6 +11,7 @@ class STFT:
         self.dim_f = dim_f
         self.device = device
 
+    @float32_only
     def __call__(self, x):
         
         x_is_mps = not x.device.type in ["cuda", "cpu"]
@@ -29,6 +31,7 @@ class STFT:
 
         return x[..., :self.dim_f, :]
 
+    @float32_only
     def inverse(self, x):
         
         x_is_mps = not x.device.type in ["cuda", "cpu"]
@@ -0,0 +1,204 @@
+# model_catalog.py
+import hashlib
+import json
+import os
+import threading
+from glob import glob
+
+import yaml
+
+# --- CONFIGURAÇÕES ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_FOLDER = os.path.join(BASE_DIR, 'models')
+# Fora de models/ (salvar o índice não altera o mtime dos diretórios listados) e fora do código-fonte, como os
+# demais caches; as entradas são por caminho real e assinatura, então checkouts diferentes podem dividir o arquivo.
+MODEL_CATALOG_PATH = os.environ.get('MODEL_CATALOG_PATH', '/tmp/model_catalog.json')
+
+MODEL_EXTENSIONS = ('.onnx', '.ckpt', '.yaml', '.gz', '.th')
+ARCH_FOLDERS = {'MDX_Net_Models': 'MDX-Net', 'Demucs_Models': 'Demucs', 'VR_Models': 'VR'}
+MDX_HASH_JSON = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', 'model_data', 'model_data.json')
+HASH_TAIL_BYTES = 10000 * 1024
+CATALOG_VERSION = 1
+
+# --- FUNÇÕES AUXILIARES ---
+def file_signature(path):
+    """(tamanho, mtime_ns) do arquivo, ou None se ele não existir."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def hash_model_file(path):
+    """MD5 dos últimos 10 MB do arquivo (do arquivo inteiro se for menor), o hash usado pelo model_data.json."""
+    with open(path, 'rb') as f:
+        try:
+            f.seek(-HASH_TAIL_BYTES, 2)
+        except OSError:
+            f.seek(0)
+        return hashlib.md5(f.read()).hexdigest()
+
+def demucs_stem_count(model_name):
+    if '6s' in model_name:
+        return 6
+    if 'htdemucs' in model_name:
+        return 4
+    return 2
+
+def architecture_of(path, models_folder=MODELS_FOLDER):
+    relative = os.path.relpath(path, models_folder).split(os.sep)
+    return ARCH_FOLDERS.get(relative[0]) if len(relative) > 1 else None
+
+class ModelCatalog:
+    """
+    Índice dos arquivos de modelo, chaveado pelo caminho e validado por
+    (tamanho, mtime). Cada entrada guarda o hash do arquivo, a arquitetura, o
+    número de stems, os parâmetros resolvidos do model_data.json (MDX) e, para
+    bags do Demucs (.yaml), os arquivos .th que fazem parte dela.
+
+    O índice é persistido em `index_path`, então um worker novo não precisa
+    reler os modelos; uma entrada só é recalculada quando o arquivo muda.
+    """
+
+    def __init__(self, models_folder=MODELS_FOLDER, index_path=MODEL_CATALOG_PATH, mdx_hash_json=MDX_HASH_JSON):
+        self.models_folder = os.path.realpath(models_folder)
+        self.index_path = index_path
+        self.mdx_hash_json = mdx_hash_json
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._mdx_params = None
+        self._mdx_params_signature = None
+        self._listing = None
+        self._dir_signatures = {}
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('version') == CATALOG_VERSION:
+            self._entries = index.get('entries', {})
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': CATALOG_VERSION, 'entries': self._entries}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Catálogo de modelos: não foi possível salvar o índice em {self.index_path}: {e}")
+
+    def mdx_model_params(self):
+        """Conteúdo do model_data.json, relido só quando o arquivo muda."""
+        with self._lock:
+            signature = file_signature(self.mdx_hash_json)
+            if signature != self._mdx_params_signature:
+                try:
+                    with open(self.mdx_hash_json, 'r') as f:
+                        self._mdx_params = json.load(f)
+                except (OSError, ValueError):
+                    self._mdx_params = {}
+                self._mdx_params_signature = signature
+            return self._mdx_params
+
+    def _build_entry(self, path, signature):
+        name = os.path.splitext(os.path.basename(path))[0]
+        arch = architecture_of(path, self.models_folder)
+        entry = {'signature': signature, 'name': name, 'arch': arch, 'hash': hash_model_file(path)}
+
+        if path.endswith('.yaml'):
+            with open(path, 'r') as f:
+                bag = yaml.safe_load(f) or {}
+            entry['members'] = [p for sig in bag.get('models', [])
+                                for p in sorted(glob(os.path.join(os.path.dirname(path), f'{sig}*.th')))]
+
+        if arch == 'Demucs':
+            entry['stem_count'] = demucs_stem_count(name)
+        elif arch == 'MDX-Net':
+            entry['stem_count'] = 2
+        return entry
+
+    def entry(self, path):
+        """Entrada do catálogo para `path` (recalculada se o arquivo mudou), ou None se ele não existir."""
+        path = os.path.realpath(path)
+        signature = file_signature(path) if os.path.isfile(path) else None
+        if signature is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry['signature'] != signature:
+                entry = self._entries[path] = self._build_entry(path, signature)
+                self._save_index()
+
+            if entry['arch'] == 'MDX-Net':
+                # Os parâmetros são resolvidos de novo se o model_data.json mudou.
+                mdx_params = self.mdx_model_params()
+                if entry.get('params_signature') != self._mdx_params_signature:
+                    entry['params'] = mdx_params.get(entry['hash'], {})
+                    entry['params_signature'] = self._mdx_params_signature
+            return entry
+
+    def model_hash(self, path):
+        entry = self.entry(path)
+        if entry is None:
+            raise FileNotFoundError(path)
+        return entry['hash']
+
+    def mdx_params(self, path):
+        """Parâmetros do model_data.json para o modelo MDX em `path` ({} se não houver)."""
+        entry = self.entry(path)
+        return dict(entry.get('params', {})) if entry else {}
+
+    def fingerprint(self, path):
+        """
+        Hash que identifica os pesos do modelo. Para bags do Demucs (.yaml) inclui
+        também os arquivos .th das assinaturas listadas no yaml.
+        """
+        entry = self.entry(path)
+        if entry is None:
+            raise FileNotFoundError(path)
+        hashes = [entry['hash']] + [self.model_hash(member) for member in entry.get('members', [])]
+        return hashlib.md5(''.join(hashes).encode('utf-8')).hexdigest()
+
+    def _walk(self):
+        dir_signatures, files = {}, []
+        for root, _, names in os.walk(self.models_folder):
+            dir_signatures[root] = file_signature(root)
+            files += [os.path.join(root, name) for name in names if name.endswith(MODEL_EXTENSIONS)]
+        return dir_signatures, files
+
+    def _is_listing_stale(self):
+        return self._listing is None or any(file_signature(d) != s for d, s in self._dir_signatures.items())
+
+    def list_models(self):
+        """
+        Modelos por arquitetura, no formato do endpoint /models. O diretório só
+        é percorrido de novo quando algum subdiretório de `models/` muda.
+        """
+        with self._lock:
+            if self._is_listing_stale():
+                self._dir_signatures, files = self._walk()
+                listing = {}
+                for path in files:
+                    arch = architecture_of(path, self.models_folder)
+                    if arch:
+                        listing.setdefault(arch, set()).add(os.path.splitext(os.path.basename(path))[0])
+                self._listing = {arch: sorted(names) for arch, names in listing.items()}
+
+                # Entradas de arquivos removidos saem do índice.
+                removed = [p for p in self._entries if file_signature(p) is None]
+                for path in removed:
+                    del self._entries[path]
+                if removed:
+                    self._save_index()
+            return self._listing
+
+    def index_all(self):
+        """Indexa (hash, parâmetros) todos os modelos de `models/`, p.ex. no boot do worker."""
+        for path in self._walk()[1]:
+            self.entry(path)
+
+MODEL_CATALOG = ModelCatalog()
@@ -0,0 +1,158 @@
+# model_registry.py
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+# --- CONFIGURAÇÕES ---
+# Orçamentos em MB para os modelos mantidos residentes entre jobs.
+# Um valor <= 0 desativa o limite daquele tipo de memória.
+MODEL_REGISTRY_VRAM_MB = int(os.environ.get('MODEL_REGISTRY_VRAM_MB', 6144))
+MODEL_REGISTRY_RAM_MB = int(os.environ.get('MODEL_REGISTRY_RAM_MB', 8192))
+MODEL_REGISTRY_ENABLED = os.environ.get('MODEL_REGISTRY_ENABLED', '1') != '0'
+
+HOST_POOL = 'ram'
+DEVICE_POOL = 'vram'
+
+# --- FUNÇÕES AUXILIARES ---
+def module_nbytes(module):
+    """Soma o tamanho, em bytes, dos parâmetros e buffers de um nn.Module."""
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def estimate_nbytes(obj):
+    if isinstance(obj, torch.nn.Module):
+        return module_nbytes(obj)
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_nbytes(o) for o in obj)
+    return 0
+
+def device_pool(device):
+    device_type = device.type if isinstance(device, torch.device) else str(device).split(':')[0]
+    return HOST_POOL if device_type == 'cpu' else DEVICE_POOL
+
+def release_memory():
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+class _Entry:
+    def __init__(self, value, nbytes, pool):
+        self.value = value
+        self.nbytes = nbytes
+        self.pool = pool
+
+class ModelRegistry:
+    """
+    Registro de modelos carregados no nível do processo.
+
+    As entradas são indexadas por (tipo, nome do modelo, caminho, device) e
+    ficam residentes entre jobs. Quando o orçamento de VRAM/RAM de um pool é
+    ultrapassado, as entradas menos usadas recentemente daquele pool são
+    descartadas.
+    """
+
+    def __init__(self, vram_budget_mb=MODEL_REGISTRY_VRAM_MB, ram_budget_mb=MODEL_REGISTRY_RAM_MB):
+        self.budgets = {
+            DEVICE_POOL: vram_budget_mb * 1024**2 if vram_budget_mb > 0 else None,
+            HOST_POOL: ram_budget_mb * 1024**2 if ram_budget_mb > 0 else None,
+        }
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind, model_name, model_path, device, *extra):
+        return (kind, model_name, os.path.abspath(str(model_path)), str(device), *extra)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key, loader, nbytes=None):
+        """
+        Retorna o objeto registrado em `key`, carregando-o com `loader()` se
+        necessário. Jobs concorrentes que pedem a mesma chave aguardam o
+        primeiro carregamento em vez de carregar o modelo de novo.
+
+        `nbytes` pode ser um inteiro ou uma função que recebe o objeto
+        carregado; por padrão o tamanho é estimado pelos tensores do módulo.
+        """
+        if not MODEL_REGISTRY_ENABLED:
+            return loader()
+
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+
+            value = loader()
+            size = nbytes(value) if callable(nbytes) else nbytes
+            size = estimate_nbytes(value) if size is None else size
+            pool = device_pool(key[3])
+
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = _Entry(value, size, pool)
+                evicted = self._evict(pool, keep=key)
+
+            if evicted:
+                release_memory()
+
+            return value
+
+    def _evict(self, pool, keep=None):
+        budget = self.budgets.get(pool)
+        if budget is None:
+            return []
+
+        evicted = []
+        for key in list(self._entries.keys()):
+            if self.used_bytes(pool) <= budget:
+                break
+            if key == keep or self._entries[key].pool != pool:
+                continue
+            evicted.append(key)
+            del self._entries[key]
+
+        for key in evicted:
+            print(f"Modelo removido do registro (LRU): {key[1]} [{key[3]}]")
+
+        return evicted
+
+    def used_bytes(self, pool):
+        return sum(e.nbytes for e in self._entries.values() if e.pool == pool)
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def evict(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            release_memory()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        release_memory()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': [f"{k[0]}:{k[1]}@{k[3]}" for k in self._entries.keys()],
+                'vram_bytes': self.used_bytes(DEVICE_POOL),
+                'ram_bytes': self.used_bytes(HOST_POOL),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,121 @@
+# r2_storage.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+# --- CONFIGURAÇÕES ---
+R2_UPLOAD_PART_MB = int(os.environ.get('R2_UPLOAD_PART_MB', 8))  # mínimo de 5 MB exigido pelo S3
+R2_UPLOAD_CONCURRENCY = int(os.environ.get('R2_UPLOAD_CONCURRENCY', 4))
+R2_MAX_POOL_CONNECTIONS = int(os.environ.get('R2_MAX_POOL_CONNECTIONS', 32))
+R2_STREAMING_UPLOAD = os.environ.get('R2_STREAMING_UPLOAD', '1') != '0'
+
+_client = None
+_client_lock = threading.Lock()
+
+# --- FUNÇÕES AUXILIARES ---
+def get_r2_client():
+    """Cliente S3 do R2 compartilhado pelo processo (boto3 é thread-safe), com pool de conexões."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = boto3.client(
+                service_name='s3', endpoint_url=os.environ.get('R2_ENDPOINT_URL'),
+                aws_access_key_id=os.environ.get('R2_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.environ.get('R2_SECRET_ACCESS_KEY'),
+                region_name='auto',
+                config=Config(max_pool_connections=R2_MAX_POOL_CONNECTIONS, retries={'max_attempts': 5, 'mode': 'standard'})
+            )
+        return _client
+
+def public_url(key):
+    return f"https://{os.environ.get('R2_PUBLIC_DOMAIN')}/{key}"
+
+class MultipartUploadWriter:
+    """
+    Arquivo somente-escrita que envia o conteúdo direto para um multipart
+    upload. Cada parte de `part_size` bytes é enviada em paralelo enquanto o
+    job continua escrevendo; no máximo `concurrency` partes ficam em memória
+    sendo enviadas, além do buffer da parte em formação (`write` bloqueia até
+    uma delas terminar).
+
+    Não implementa tell/seek, então o zipfile grava com data descriptors
+    (modo de escrita sem seek). Usar como context manager: uma exceção
+    cancela o upload, o fechamento normal o conclui.
+    """
+
+    def __init__(self, bucket, key, client=None, part_size=R2_UPLOAD_PART_MB * 1024**2, concurrency=R2_UPLOAD_CONCURRENCY):
+        self.client = client or get_r2_client()
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+        self.pool = ThreadPoolExecutor(max(1, concurrency))
+        self._slots = threading.Semaphore(max(1, concurrency))
+        self._buffer = bytearray()
+        self._futures = []
+        self.size = 0
+        self.closed = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _submit(self, body):
+        self._slots.acquire()
+        part_number = len(self._futures) + 1
+        future = self.pool.submit(self._upload_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, body):
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=part_number, Body=body)
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def close(self):
+        """Envia a última parte e conclui o upload."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._buffer or not self._futures:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            parts = [future.result() for future in self._futures]
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.pool.shutdown()
+
+    def abort(self):
+        self.closed = True
+        self.pool.shutdown(cancel_futures=True)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"Falha ao cancelar o multipart upload de {self.key}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
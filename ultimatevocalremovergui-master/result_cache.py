@@ -0,0 +1,228 @@
+# result_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# --- CONFIGURAÇÕES ---
+RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'disk')  # 'disk', 's3' ou 'none'
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '/tmp/separation_cache')
+RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', 10240))
+RESULT_CACHE_PREFIX = os.environ.get('RESULT_CACHE_PREFIX', 'separation-cache/')
+
+ZIP_ENTRY = 'results.zip'
+META_ENTRY = 'meta.json'
+
+# --- FUNÇÕES AUXILIARES ---
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 do conteúdo completo do arquivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_cache_key(audio_hash, model_hash, model_data):
+    """
+    Chave do cache: hash do áudio, hash do modelo e todos os parâmetros
+    efetivos de `model_data`. Valores não serializáveis entram pelo repr().
+    """
+    payload = json.dumps({
+        'audio': audio_hash,
+        'model': model_hash,
+        'params': vars(model_data),
+    }, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def stem_suffix(filename, audio_file_base):
+    """Remove o nome do arquivo original do stem, p.ex. 'musica_(Vocals).wav' -> '_(Vocals).wav'."""
+    return filename[len(audio_file_base):] if filename.startswith(audio_file_base) else filename
+
+class DiskCacheBackend:
+    """Um diretório por chave, com LRU pela data de acesso (mtime do diretório)."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, dest_dir):
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, META_ENTRY)
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+
+        restored = {}
+        for name in meta['files']:
+            restored[name] = os.path.join(dest_dir, f".cache_{name}")
+            shutil.copyfile(os.path.join(entry_dir, name), restored[name])
+
+        os.utime(entry_dir)
+        return meta, restored
+
+    def put(self, key, meta, files):
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        for name, path in files.items():
+            shutil.copyfile(path, os.path.join(tmp_dir, name))
+        with open(os.path.join(tmp_dir, META_ENTRY), 'w') as f:
+            json.dump({**meta, 'files': list(files.keys())}, f)
+
+        if os.path.exists(entry_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, entry_dir)
+
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path) or '.tmp-' in name:
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            print(f"Cache de resultados: entrada removida (LRU) {os.path.basename(path)}")
+
+class S3CacheBackend:
+    """
+    Backend em object store compatível com S3 (R2). Cada chave vira um
+    prefixo; o LastModified dos objetos é renovado a cada acerto para
+    servir de ordem LRU.
+    """
+
+    def __init__(self, client, bucket, prefix, max_bytes):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+
+    def _object_key(self, key, name):
+        return f"{self.prefix}{key}/{name}"
+
+    def _touch(self, object_key):
+        self.client.copy_object(Bucket=self.bucket, Key=object_key, MetadataDirective='REPLACE',
+                                CopySource={'Bucket': self.bucket, 'Key': object_key})
+
+    def get(self, key, dest_dir):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key, META_ENTRY))['Body']
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+        meta = json.loads(body.read())
+        restored = {}
+        for name in meta['files']:
+            restored[name] = os.path.join(dest_dir, f".cache_{name}")
+            self.client.download_file(self.bucket, self._object_key(key, name), restored[name])
+
+        self._touch(self._object_key(key, META_ENTRY))
+        return meta, restored
+
+    def put(self, key, meta, files):
+        for name, path in files.items():
+            self.client.upload_file(path, self.bucket, self._object_key(key, name))
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key, META_ENTRY),
+                               Body=json.dumps({**meta, 'files': list(files.keys())}).encode('utf-8'))
+        self.evict()
+
+    def evict(self):
+        entries = {}
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(self.prefix):].split('/', 1)[0]
+                size, last_used, objects = entries.get(key, (0, 0, []))
+                last_used = max(last_used, obj['LastModified'].timestamp()) if obj['Key'].endswith(META_ENTRY) else last_used
+                entries[key] = (size + obj['Size'], last_used, objects + [obj['Key']])
+
+        total = sum(size for size, _, _ in entries.values())
+        for key, (size, _, objects) in sorted(entries.items(), key=lambda e: e[1][1]):
+            if total <= self.max_bytes:
+                break
+            self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': [{'Key': k} for k in objects]})
+            total -= size
+            print(f"Cache de resultados: entrada removida (LRU) {key}")
+
+class ResultCache:
+    """
+    Cache de resultados de separação endereçado por conteúdo. Guarda os
+    stems e o zip de cada combinação (áudio, modelo, parâmetros) e conta
+    acertos/falhas.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def get(self, key, dest_dir):
+        """Retorna (meta, {nome: caminho_local}) ou None. Falhas do backend contam como miss."""
+        entry = None
+        if self.enabled and key:
+            try:
+                entry = self.backend.get(key, dest_dir)
+            except Exception as e:
+                print(f"Cache de resultados indisponível na leitura: {e}")
+
+        with self._lock:
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def put(self, key, meta, files):
+        if not self.enabled or not key:
+            return
+        try:
+            self.backend.put(key, {**meta, 'created_at': time.time()}, files)
+        except Exception as e:
+            print(f"Cache de resultados indisponível na escrita: {e}")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+def create_result_cache():
+    max_bytes = RESULT_CACHE_MAX_MB * 1024**2
+
+    if RESULT_CACHE_BACKEND == 'disk':
+        return ResultCache(DiskCacheBackend(RESULT_CACHE_DIR, max_bytes))
+
+    if RESULT_CACHE_BACKEND == 's3':
+        from r2_storage import get_r2_client
+        client = get_r2_client()
+        bucket = os.environ.get('RESULT_CACHE_BUCKET', os.environ.get('R2_BUCKET_NAME'))
+        return ResultCache(S3CacheBackend(client, bucket, RESULT_CACHE_PREFIX, max_bytes))
+
+    return ResultCache(None)
+
+RESULT_CACHE = create_result_cache()
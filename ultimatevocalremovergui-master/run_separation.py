@@ -3,17 +3,21 @@ import os
 import argparse
 import requests
 import uuid
-import json
-import hashlib
-import boto3
 from argparse import Namespace
 import torch
-from demucs.hdemucs import HDemucs
 import zipfile
+import threading
+import time
 import traceback
 
-torch.serialization.add_safe_globals([HDemucs])
-from separate import SeperateDemucs, SeperateMDX
+from concurrent.futures import ThreadPoolExecutor
+from separate import SeperateDemucs, SeperateMDX, prepare_mix
+from downloader import download_file
+from result_cache import RESULT_CACHE, ZIP_ENTRY, hash_file, make_cache_key, stem_suffix
+from stem_export import StemExporter
+from r2_storage import R2_STREAMING_UPLOAD, MultipartUploadWriter, get_r2_client, public_url
+from timing import NULL_TIMER
+from model_catalog import MODEL_CATALOG, demucs_stem_count
 
 # --- CONSTANTES ---
 DEMUCS_ARCH_TYPE = 'Demucs'
@@ -29,31 +33,46 @@ DEMUCS_V4 = 'v4'
 # --- CAMINHOS E CONFIGURAÇÕES ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_FOLDER = os.path.join(BASE_DIR, 'models')
+# Semente dos deslocamentos aleatórios (shift trick) do Demucs; vazio = não determinístico
+DEMUCS_SEED = os.environ.get('DEMUCS_SEED', '0')
+# Em lotes, decodifica a próxima faixa inteira durante a inferência da atual. Desligado por padrão: mantém até duas
+# faixas decodificadas em memória e anula o streaming do mix; sem ele, a prefetch só baixa a faixa e consulta o cache
+BATCH_PREDECODE = os.environ.get('BATCH_PREDECODE', '0') != '0'
+# Chunks do MDX-Net/MDX-C processados por chamada do modelo (1 = um chunk por vez)
+MDX_BATCH_SIZE = max(1, int(os.environ.get('MDX_BATCH_SIZE', 4)))
+# Mix em streaming: segundos decodificados por bloco
+STREAM_BLOCK_SECONDS = float(os.environ.get('STREAM_BLOCK_SECONDS', 10))
+# Destino da saída do overlap-add do MDX/MDX-C: 'auto' (pinned com CUDA, host sem), 'host', 'pinned' ou 'memmap'
+# (arquivo temporário em ACCUMULATION_DIR, para faixas longas que não devem ficar na RAM)
+ACCUMULATION_MODE = os.environ.get('ACCUMULATION_MODE', 'auto')
+ACCUMULATION_DIR = os.environ.get('ACCUMULATION_DIR') or None
+# Separações simultâneas no device; download, upload e notificação de outros jobs rodam fora deste limite
+INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS', 1))
+NOTIFY_RETRIES = int(os.environ.get('NOTIFY_RETRIES', 3))
+# Modelos MDX .onnx em CPU: sessões paralelas (cada uma com um chunk do lote) e threads por sessão (0 = cores / sessões)
+ORT_CPU_SESSIONS = int(os.environ.get('ORT_CPU_SESSIONS', 1))
+ORT_CPU_THREADS = int(os.environ.get('ORT_CPU_THREADS', 0))
+# Precisão reduzida por arquitetura ('float32', 'bfloat16' ou 'float16'). Só é usada se, no início da faixa,
+# a saída ficar a pelo menos PRECISION_MIN_SDR_DB dB de SDR da saída em float32 (medição guardada no cache de artefatos).
+MDX_INFERENCE_DTYPE = os.environ.get('MDX_INFERENCE_DTYPE', 'float32')
+DEMUCS_INFERENCE_DTYPE = os.environ.get('DEMUCS_INFERENCE_DTYPE', 'float32')
+PRECISION_MIN_SDR_DB = float(os.environ.get('PRECISION_MIN_SDR_DB', 30))
+# Padrão para jobs sem "quantize": variante int8 (quantização dinâmica) do Demucs e do denoiser VR em workers só com CPU
+QUANTIZE_INT8 = os.environ.get('QUANTIZE_INT8', '0') != '0'
+# Forward do Demucs/MDX-C/MDX .ckpt: 'off', 'trace' (TorchScript por shape de segmento, salvo no cache de artefatos)
+# ou 'compile' (torch.compile, com o cache do inductor dentro do diretório de artefatos)
+MODEL_COMPILE = os.environ.get('MODEL_COMPILE', 'off')
 
-# --- FUNÇÕES AUXILIARES ---
-def get_model_hash(model_path):
-    try:
-        with open(model_path, 'rb') as f:
-            f.seek(-10000 * 1024, 2)
-            return hashlib.md5(f.read()).hexdigest()
-    except:
-        return hashlib.md5(open(model_path, 'rb').read()).hexdigest()
-
-MDX_HASH_JSON = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', 'model_data', 'model_data.json')
-MDX_MODEL_PARAMS = {}
-if os.path.exists(MDX_HASH_JSON):
-    with open(MDX_HASH_JSON, 'r') as f:
-        MDX_MODEL_PARAMS = json.load(f)
-
-# --- FUNÇÃO PRINCIPAL DE EXECUÇÃO ---
-def execute_separation(args):
-    print(f"--- Processo de separação iniciado para o Job ID: {args.jobId} ---")
+INFERENCE_SLOT = threading.BoundedSemaphore(max(1, INFERENCE_SLOTS))
+NOTIFY_POOL = ThreadPoolExecutor(2, thread_name_prefix='notify')
 
-    work_dir = f"/tmp/{args.jobId}"
-    input_path = os.path.join(work_dir, args.filename)
-    output_folder = work_dir
+# --- FUNÇÕES AUXILIARES ---
+def get_model_fingerprint(model_path):
+    return MODEL_CATALOG.fingerprint(model_path)
 
-    process_data = {
+# --- ETAPAS DO JOB ---
+def build_process_data(input_path, output_folder):
+    return {
         'audio_file': input_path,
         'audio_file_base': os.path.splitext(os.path.basename(input_path))[0],
         'export_path': output_folder,
@@ -67,11 +86,16 @@ def execute_separation(args):
         'list_all_models': []
     }
 
+def build_model_data(model_name, process_method, is_quantized=None):
+    """
+    Monta o Namespace `model_data` do job. Retorna (model_data, None) ou (None, erro).
+    `is_quantized` escolhe a variante int8 para este job (None = QUANTIZE_INT8).
+    """
     params, model_path = {}, ""
     
-    if args.process_method == MDX_ARCH_TYPE:
-        onnx_path = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', f'{args.model_name}.onnx')
-        ckpt_path = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', f'{args.model_name}.ckpt')
+    if process_method == MDX_ARCH_TYPE:
+        onnx_path = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', f'{model_name}.onnx')
+        ckpt_path = os.path.join(MODELS_FOLDER, 'MDX_Net_Models', f'{model_name}.ckpt')
         if os.path.exists(onnx_path):
             model_path = onnx_path
             params['is_mdx_ckpt'] = False
@@ -79,28 +103,23 @@ def execute_separation(args):
             model_path = ckpt_path
             params['is_mdx_ckpt'] = True
         else:
-            return {"error": f"Modelo MDX-Net não encontrado: {args.model_name}"}
+            return None, {"error": f"Modelo MDX-Net não encontrado: {model_name}"}
         
-        model_hash = get_model_hash(model_path)
-        model_params_json = MDX_MODEL_PARAMS.get(model_hash, {})
-        params.update(model_params_json)
+        params.update(MODEL_CATALOG.mdx_params(model_path))
+        params['inference_dtype'] = MDX_INFERENCE_DTYPE
 
-    elif args.process_method == DEMUCS_ARCH_TYPE:
-        model_path = os.path.join(MODELS_FOLDER, 'Demucs_Models', 'v3_v4_repo', f'{args.model_name}.yaml')
+    elif process_method == DEMUCS_ARCH_TYPE:
+        model_path = os.path.join(MODELS_FOLDER, 'Demucs_Models', 'v3_v4_repo', f'{model_name}.yaml')
         if not os.path.exists(model_path):
-             model_path = os.path.join(MODELS_FOLDER, 'Demucs_Models', f'{args.model_name}.ckpt')
+             model_path = os.path.join(MODELS_FOLDER, 'Demucs_Models', f'{model_name}.ckpt')
 
-        if '6s' in args.model_name:
-             params['demucs_stem_count'] = 6
-        elif 'htdemucs' in args.model_name:
-            params['demucs_stem_count'] = 4
-        else:
-            params['demucs_stem_count'] = 2
+        params['demucs_stem_count'] = demucs_stem_count(model_name)
+        params['inference_dtype'] = DEMUCS_INFERENCE_DTYPE
 
     default_params = {
         'is_mdx_ckpt': False, 'is_tta': False, 'is_post_process': False, 'is_high_end_process': 'none', 
         'post_process_threshold': 0.1, 'aggression_setting': 0.1, 'batch_size': 4, 'window_size': 512, 
-        'is_denoise': False, 'is_denoise_model': False, 'is_mdx_c_seg_def': False, 'mdx_batch_size': 1, 
+        'is_denoise': False, 'is_denoise_model': False, 'is_mdx_c_seg_def': False, 'mdx_batch_size': MDX_BATCH_SIZE, 
         'compensate': 1.035, 'mdx_segment_size': 256, 'mdx_dim_f_set': None, 'mdx_dim_t_set': None, 
         'mdx_n_fft_scale_set': None, 'chunks': 0, 'margin': 44100, 'demucs_version': DEMUCS_V4, 
         'segment': DEFAULT, 'shifts': 2, 'overlap': 0.25, 'is_split_mode': True, 'is_chunk_demucs': True, 
@@ -123,64 +142,258 @@ def execute_separation(args):
         'bv_model_rebalance': 0.0, 'is_sec_bv_rebalance': False, 'deverb_vocal_opt': None, 
         'is_save_vocal_only': False, 'secondary_model_4_stem': [None]*4, 
         'secondary_model_4_stem_scale': [0.5]*4, 'ensemble_primary_stem': VOCAL_STEM, 
-        'is_multi_stem_ensemble': False
+        'is_multi_stem_ensemble': False, 'is_stream_mix': True, 'is_demucs_batch_shifts': True,
+        'stream_block_size': int(44100 * STREAM_BLOCK_SECONDS),
+        'accumulation_mode': ACCUMULATION_MODE, 'accumulation_dir': ACCUMULATION_DIR,
+        'demucs_seed': int(DEMUCS_SEED) if DEMUCS_SEED else None,
+        'ort_cpu_sessions': ORT_CPU_SESSIONS, 'ort_cpu_threads': ORT_CPU_THREADS,
+        'precision_min_sdr': PRECISION_MIN_SDR_DB, 'compile_mode': MODEL_COMPILE,
+        'is_quantized': QUANTIZE_INT8 if is_quantized is None else bool(is_quantized)
     }
     
-    job_specific_params = {'process_method': args.process_method, 'model_path': model_path, 'model_name': args.model_name, 'model_basename': args.model_name}
+    job_specific_params = {'process_method': process_method, 'model_path': model_path, 'model_name': model_name, 'model_basename': model_name}
     final_params = {**default_params, **params, **job_specific_params}
     model_data = Namespace(**final_params)
+    return model_data, None
 
+def run_separator(model_data, process_data, zip_target=None):
+    """
+    Roda a separação exportando os stems em paralelo. Com `zip_target` (caminho
+    ou upload em streaming) o zip é montado junto.
+    """
+    timer = process_data.get('timer') or NULL_TIMER
+    exporter = StemExporter(zip_target, model_data.wav_type_set, model_data.mp3_bit_set)
     try:
-        separator = None
-        if model_data.process_method == DEMUCS_ARCH_TYPE:
-            separator = SeperateDemucs(model_data=model_data, process_data=process_data)
-        elif model_data.process_method == MDX_ARCH_TYPE:
-            separator = SeperateMDX(model_data=model_data, process_data=process_data)
-        if separator:
-            separator.seperate()
-            print("\nSeparação concluída!")
+        process_data['export_stem'] = exporter.submit
+        # Só a inferência ocupa o device; a exportação e o upload dos stems seguem fora do slot.
+        with timer.span('wait_inference_slot'):
+            INFERENCE_SLOT.acquire()
+        try:
+            run_model(model_data, process_data)
+        finally:
+            INFERENCE_SLOT.release()
+    finally:
+        # Espera os stems que ainda estão sendo codificados/zipados (e enviados, em streaming).
+        with timer.span('export_wait'):
+            exporter.close()
+    print("Exportação dos stems concluída.")
+
+def run_model(model_data, process_data):
+    separator = None
+    if model_data.process_method == DEMUCS_ARCH_TYPE:
+        separator = SeperateDemucs(model_data=model_data, process_data=process_data)
+    elif model_data.process_method == MDX_ARCH_TYPE:
+        separator = SeperateMDX(model_data=model_data, process_data=process_data)
+    if separator:
+        separator.seperate()
+        print("\nSeparação concluída!")
+    else:
+        raise ValueError(f"Método de processamento não suportado: {model_data.process_method}")
+
+def list_stems(output_folder, input_filename):
+    return [file for file in sorted(os.listdir(output_folder)) 
+            if file.lower().endswith(('.wav', '.mp3', '.flac')) and file != input_filename]
+
+def package_results(output_folder, zip_path_local, input_filename):
+    with zipfile.ZipFile(zip_path_local, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file in list_stems(output_folder, input_filename):
+            zipf.write(os.path.join(output_folder, file), os.path.basename(file))
+    print("Compactação concluída.")
+
+def restore_cached_results(cached, output_folder, zip_path_local, audio_file_base, input_filename):
+    """Coloca os stems e o zip do cache no diretório do job, renomeando os stems para o arquivo atual."""
+    meta, files = cached
+    zip_cached = files.pop(ZIP_ENTRY, None)
+
+    for suffix, path in files.items():
+        os.replace(path, os.path.join(output_folder, f"{audio_file_base}{suffix}"))
+
+    if zip_cached and meta.get('audio_file_base') == audio_file_base:
+        os.replace(zip_cached, zip_path_local)
+    else:
+        if zip_cached:
+            os.remove(zip_cached)
+        package_results(output_folder, zip_path_local, input_filename)
+
+def store_cached_results(cache_key, output_folder, zip_path_local, audio_file_base, input_filename):
+    # Com upload em streaming não existe zip local; ele é remontado a partir dos stems num acerto.
+    files = {ZIP_ENTRY: zip_path_local} if os.path.exists(zip_path_local) else {}
+    for file in list_stems(output_folder, input_filename):
+        files[stem_suffix(file, audio_file_base)] = os.path.join(output_folder, file)
+    RESULT_CACHE.put(cache_key, {'audio_file_base': audio_file_base}, files)
+
+def upload_results(zip_path_local, zip_filename_r2):
+    bucket_name = os.environ.get('R2_BUCKET_NAME')
+    
+    print(f"Enviando {zip_filename_r2} para o bucket R2: {bucket_name}")
+    get_r2_client().upload_file(zip_path_local, bucket_name, zip_filename_r2)
+    download_url = public_url(zip_filename_r2)
+    print(f"Upload para R2 concluído! URL de download: {download_url}")
+    return download_url
+
+def notify_completion(args, download_url):
+    finish_url = f'{args.baseUrl}/mixbuster/finish_job.php'
+    payload = {'jobId': args.jobId, 'downloadUrl': download_url, 'originalFilename': args.filename}
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    response = requests.post(finish_url, data=payload, headers=headers)
+    response.raise_for_status()
+    
+    print(f"Notificação de conclusão enviada com SUCESSO para: {finish_url}")
+
+def notify_in_background(args, download_url):
+    """Envia a notificação fora do job, com novas tentativas; falhas só ficam no log."""
+    def notify():
+        for attempt in range(1, NOTIFY_RETRIES + 1):
+            try:
+                return notify_completion(args, download_url)
+            except Exception as e:
+                print(f"Falha ao notificar o job {args.jobId} (tentativa {attempt}/{NOTIFY_RETRIES}): {e}")
+                time.sleep(2 ** attempt)
+        print(f"ERRO: job {args.jobId} concluído sem notificação. URL: {download_url}")
+
+    return NOTIFY_POOL.submit(notify)
+
+# --- ETAPAS DE UMA FAIXA ---
+def prepare_track(args, model_data, timer=NULL_TIMER, is_predecode=False):
+    """
+    Consulta o cache de resultados da faixa e, com `is_predecode`, já decodifica
+    o áudio para `process_data['mix']`. Retorna o estado usado pelas próximas etapas.
+    """
+    work_dir = f"/tmp/{args.jobId}"
+    input_path = os.path.join(work_dir, args.filename)
+    zip_filename_r2 = f"{args.jobId}-mixbusted.zip"
+
+    process_data = build_process_data(input_path, work_dir)
+    process_data['timer'] = timer
+    track = Namespace(args=args, work_dir=work_dir, input_path=input_path, process_data=process_data,
+                      audio_file_base=process_data['audio_file_base'], zip_filename_r2=zip_filename_r2,
+                      zip_path_local=os.path.join(work_dir, zip_filename_r2),
+                      cache_key=None, cached=None, cache_status='disabled', download_url=None)
+
+    if RESULT_CACHE.enabled and os.path.exists(model_data.model_path):
+        with timer.span('cache_lookup'):
+            track.cache_key = make_cache_key(hash_file(input_path), get_model_fingerprint(model_data.model_path), model_data)
+            track.cached = RESULT_CACHE.get(track.cache_key, work_dir)
+        track.cache_status = 'hit' if track.cached else 'miss'
+        print(f"Cache de resultados: {track.cache_status} {RESULT_CACHE.stats()}")
+
+    if is_predecode and track.cache_status != 'hit':
+        from lib_v5.audio_stream import AudioStream
+
+        with timer.span('predecode'):
+            mix = prepare_mix(input_path, is_stream=model_data.is_stream_mix)
+            process_data['mix'] = mix.load() if isinstance(mix, AudioStream) else mix
+    return track
+
+def separate_track(track, model_data, timer=NULL_TIMER):
+    if track.cache_status == 'hit':
+        with timer.span('cache_restore'):
+            restore_cached_results(track.cached, track.work_dir, track.zip_path_local, track.audio_file_base, track.args.filename)
+        return
+
+    with timer.span('separation'):
+        if R2_STREAMING_UPLOAD:
+            # O zip vai direto para um multipart upload enquanto os stems são gerados.
+            with MultipartUploadWriter(os.environ.get('R2_BUCKET_NAME'), track.zip_filename_r2) as upload:
+                run_separator(model_data, track.process_data, upload)
+            track.download_url = public_url(track.zip_filename_r2)
+            print(f"Upload em streaming para R2 concluído! URL de download: {track.download_url}")
         else:
-            raise ValueError(f"Método de processamento não suportado: {model_data.process_method}")
+            run_separator(model_data, track.process_data, track.zip_path_local)
+    # O áudio decodificado não é mais necessário e não deve ficar vivo até o fim do lote.
+    track.process_data.pop('mix', None)
+    with timer.span('cache_store'):
+        store_cached_results(track.cache_key, track.work_dir, track.zip_path_local, track.audio_file_base, track.args.filename)
+
+def finish_track(track, timer=NULL_TIMER, is_notify_background=False):
+    """Envia o zip (se ainda não foi em streaming) e notifica. Em segundo plano, a notificação não segura o job."""
+    try:
+        if track.download_url is None:
+            with timer.span('upload'):
+                track.download_url = upload_results(track.zip_path_local, track.zip_filename_r2)
+        if is_notify_background:
+            notify_in_background(track.args, track.download_url)
+            return {"status": "success", "cache": track.cache_status, "downloadUrl": track.download_url}
+        with timer.span('notify'):
+            notify_completion(track.args, track.download_url)
+        return {"status": "success", "cache": track.cache_status}
     except Exception as e:
         traceback.print_exc()
-        return {"error": f"Erro na separação: {e}"}
+        return {"error": f"Erro no upload/notificação: {e}"}
+
+# --- FUNÇÃO PRINCIPAL DE EXECUÇÃO ---
+def execute_separation(args, timer=NULL_TIMER, is_notify_background=False):
+    print(f"--- Processo de separação iniciado para o Job ID: {args.jobId} ---")
+
+    model_data, error = build_model_data(args.model_name, args.process_method, getattr(args, 'quantize', None))
+    if error:
+        return error
 
     try:
-        zip_filename_r2 = f"{args.jobId}-mixbusted.zip"
-        zip_path_local = os.path.join(work_dir, zip_filename_r2)
-        
-        with zipfile.ZipFile(zip_path_local, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file in os.listdir(output_folder):
-                if file.lower().endswith(('.wav', '.mp3', '.flac')) and file != args.filename:
-                    zipf.write(os.path.join(output_folder, file), os.path.basename(file))
-        print("Compactação concluída.")
-
-        s3 = boto3.client(
-            service_name='s3', endpoint_url=os.environ.get('R2_ENDPOINT_URL'),
-            aws_access_key_id=os.environ.get('R2_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('R2_SECRET_ACCESS_KEY'),
-            region_name='auto'
-        )
-        
-        bucket_name = os.environ.get('R2_BUCKET_NAME')
-        public_domain = os.environ.get('R2_PUBLIC_DOMAIN')
-        
-        print(f"Enviando {zip_filename_r2} para o bucket R2: {bucket_name}")
-        s3.upload_file(zip_path_local, bucket_name, zip_filename_r2)
-        download_url = f"https://{public_domain}/{zip_filename_r2}"
-        print(f"Upload para R2 concluído! URL de download: {download_url}")
-        
-        finish_url = f'{args.baseUrl}/mixbuster/finish_job.php'
-        payload = {'jobId': args.jobId, 'downloadUrl': download_url, 'originalFilename': args.filename}
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.post(finish_url, data=payload, headers=headers)
-        response.raise_for_status()
-        
-        print(f"Notificação de conclusão enviada com SUCESSO para: {finish_url}")
-        return {"status": "success"}
+        track = prepare_track(args, model_data, timer)
+        separate_track(track, model_data, timer)
     except Exception as e:
         traceback.print_exc()
-        return {"error": f"Erro no upload/notificação: {e}"}
+        return {"error": f"Erro na separação: {e}"}
+
+    return finish_track(track, timer, is_notify_background)
+
+def execute_batch(args, tracks, timers=None, is_notify_background=False):
+    """
+    Separa várias faixas com o mesmo modelo e parâmetros. `args` traz
+    model_name/process_method; cada item de `tracks` é um Namespace com
+    jobId, filename e audioUrl (ou o áudio já em /tmp/<jobId>/).
+
+    As faixas passam por um pipeline de três estágios: enquanto a faixa N está
+    na inferência, a N+1 é baixada e decodificada e a N-1 é enviada/notificada.
+    O modelo é carregado uma vez (MODEL_REGISTRY) e reaproveitado por todas.
+    Retorna um resultado por faixa, na mesma ordem.
+    """
+    print(f"--- Lote de {len(tracks)} faixa(s) iniciado com o modelo {args.model_name} ---")
+    timers = timers or [NULL_TIMER] * len(tracks)
+
+    model_data, error = build_model_data(args.model_name, args.process_method, getattr(args, 'quantize', None))
+    if error:
+        return [error] * len(tracks)
+
+    def prepare(track_args, timer):
+        if getattr(track_args, 'audioUrl', None):
+            input_path = os.path.join(f"/tmp/{track_args.jobId}", track_args.filename)
+            os.makedirs(os.path.dirname(input_path), exist_ok=True)
+            try:
+                with timer.span('audio_download'):
+                    download_file(track_args.audioUrl, input_path, expected_size=getattr(track_args, 'audioSize', None),
+                                  sha256=getattr(track_args, 'audioSha256', None), headers={'User-Agent': 'Mozilla/5.0'})
+            except requests.exceptions.RequestException as e:
+                raise RuntimeError(f"Falha ao baixar o arquivo do Cloudflare R2: {e}") from e
+        return prepare_track(track_args, model_data, timer, is_predecode=BATCH_PREDECODE)
+
+    results = [None] * len(tracks)
+    finishing = []
+
+    with ThreadPoolExecutor(1, thread_name_prefix='batch-prefetch') as prefetch, \
+         ThreadPoolExecutor(1, thread_name_prefix='batch-finish') as finisher:
+        pending = prefetch.submit(prepare, tracks[0], timers[0]) if tracks else None
+
+        for i, track_args in enumerate(tracks):
+            print(f"--- Faixa {i + 1}/{len(tracks)}: {track_args.jobId} ---")
+            current = pending
+            pending = prefetch.submit(prepare, tracks[i + 1], timers[i + 1]) if i + 1 < len(tracks) else None
+
+            try:
+                track = current.result()
+                separate_track(track, model_data, timers[i])
+            except Exception as e:
+                traceback.print_exc()
+                results[i] = {"error": f"Erro na separação: {e}"}
+                continue
+
+            finishing.append((i, finisher.submit(finish_track, track, timers[i], is_notify_background)))
+
+        for i, future in finishing:
+            results[i] = future.result()
+
+    return results
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -1,36 +1,35 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from demucs.apply import apply_model, demucs_segments
-from demucs.hdemucs import HDemucs
-from demucs.model_v2 import auto_load_demucs_model_v2
-from demucs.pretrained import get_model as _gm
-from demucs.utils import apply_model_v1
-from demucs.utils import apply_model_v2
 from lib_v5.tfc_tdf_v3 import TFC_TDF_net, STFT
 from lib_v5 import spec_utils
+from lib_v5.audio_stream import AudioStream, SlidingWindows, OverlapAdd, make_sink, STREAM_BLOCK_SIZE, ACCUMULATE_AUTO
+from lib_v5.ort_engine import OrtEngine, OrtParallelEngine
+from lib_v5.compiled_forward import COMPILE_OFF, COMPILE_TORCH, compile_forward
+from lib_v5.precision import FLOAT32, INFERENCE_DTYPES, DEFAULT_MIN_SDR_DB, PRECISION_REFERENCE_SECONDS, REFERENCE_RMS, compare_precision, device_type, inference_autocast, reference_clip
 from lib_v5.vr_network import nets
 from lib_v5.vr_network import nets_new
 from lib_v5.vr_network.model_param_init import ModelParameters
 from pathlib import Path
 from gui_data.constants import *
 from gui_data.error_handling import *
-from scipy import signal
 import audioread
+import collections.abc
+import contextlib
 import gzip
+import json
 import librosa
 import math
 import numpy as np
-import onnxruntime as ort
 import os
 import torch
 import warnings
-import pydub
 import soundfile as sf
-import lib_v5.mdxnet as MdxnetSet
 import math
 #import random
-from onnx import load
-from onnx2pytorch import ConvertModel
+from model_registry import MODEL_REGISTRY
+from model_catalog import MODEL_CATALOG
+from artifact_cache import ARTIFACT_CACHE
+from timing import NULL_TIMER
 import gc
  
 if TYPE_CHECKING:
@@ -64,6 +63,8 @@ def clear_gpu_cache():
 
 warnings.filterwarnings("ignore")
 cpu = torch.device('cpu')
+# SDR (dB) of reduced-precision against float32 output, per model/dtype/device (see resolve_precision).
+PRECISION_GATE_RESULTS = {}
 
 class SeperateAttributes:
     def __init__(self, model_data: ModelData, 
@@ -84,16 +85,21 @@ class SeperateAttributes:
         if vocal_stem_path:
             self.audio_file, self.audio_file_base = vocal_stem_path
             self.audio_file_base_voc_split = lambda stem, split:os.path.join(self.export_path, f'{self.audio_file_base.replace("_(Vocals)", "")}_({stem}_{split}).wav')
+            self.prepared_mix = None
         else:
             self.audio_file = process_data['audio_file']
             self.audio_file_base = process_data['audio_file_base']
             self.audio_file_base_voc_split = None
+            # Already decoded (2, n) mix of audio_file, e.g. prefetched by a batch job.
+            self.prepared_mix = process_data.get('mix')
         self.export_path = process_data['export_path']
         self.cached_source_callback = process_data['cached_source_callback']
         self.cached_model_source_holder = process_data['cached_model_source_holder']
         self.is_4_stem_ensemble = process_data['is_4_stem_ensemble']
         self.list_all_models = process_data['list_all_models']
         self.process_iteration = process_data['process_iteration']
+        self.export_stem = process_data.get('export_stem')
+        self.timer = process_data.get('timer') or NULL_TIMER
         self.is_return_dual = is_return_dual
         self.is_pitch_change = model_data.is_pitch_change
         self.semitone_shift = model_data.semitone_shift
@@ -169,6 +175,17 @@ class SeperateAttributes:
         self.is_opencl = False
         self.device_set = model_data.device_set
         self.is_use_opencl = model_data.is_use_opencl
+        self.stream_block_size = getattr(model_data, 'stream_block_size', STREAM_BLOCK_SIZE)
+        self.is_stream_mix = getattr(model_data, 'is_stream_mix', False) and not (self.is_pitch_change or 
+                                                                                  self.is_match_frequency_pitch or 
+                                                                                  self.is_invert_spec or 
+                                                                                  getattr(model_data, 'is_denoise_model', False))
+        self.accumulation_mode = getattr(model_data, 'accumulation_mode', ACCUMULATE_AUTO)
+        self.accumulation_dir = getattr(model_data, 'accumulation_dir', None)
+        self.inference_dtype = getattr(model_data, 'inference_dtype', FLOAT32)
+        self.precision_min_sdr = getattr(model_data, 'precision_min_sdr', DEFAULT_MIN_SDR_DB)
+        self.inference_autocast = None
+        self.compile_mode = getattr(model_data, 'compile_mode', COMPILE_OFF)
         
         if self.is_inst_only_voc_splitter or self.is_sec_bv_rebalance:
             self.is_primary_stem_only = False
@@ -192,6 +209,9 @@ class SeperateAttributes:
                     self.device = CUDA_DEVICE if not device_prefix else f'{device_prefix}:{self.device_set}'
                     self.run_type = ['CUDAExecutionProvider']
 
+        # int8 dynamic quantization only runs on CPU.
+        self.is_quantized = getattr(model_data, 'is_quantized', False) and device_type(self.device) == 'cpu'
+
         if model_data.process_method == MDX_ARCH_TYPE:
             self.is_mdx_ckpt = model_data.is_mdx_ckpt
             self.primary_model_name, self.primary_sources = self.cached_source_callback(MDX_ARCH_TYPE, model_name=self.model_basename)
@@ -201,6 +221,8 @@ class SeperateAttributes:
             self.mdx_batch_size = model_data.mdx_batch_size
             self.compensate = model_data.compensate
             self.mdx_segment_size = model_data.mdx_segment_size
+            self.ort_cpu_sessions = max(1, getattr(model_data, 'ort_cpu_sessions', 1))
+            self.ort_cpu_threads = getattr(model_data, 'ort_cpu_threads', 0)
             
             if self.is_mdx_c:
                 if not self.is_4_stem_ensemble:
@@ -255,6 +277,10 @@ class SeperateAttributes:
                     self.secondary_stem = secondary_stem(self.primary_stem)
 
             self.shifts = model_data.shifts
+            self.demucs_batch_size = getattr(model_data, 'demucs_batch_size', 0)
+            self.is_demucs_batch_shifts = getattr(model_data, 'is_demucs_batch_shifts', True)
+            self.demucs_seed = getattr(model_data, 'demucs_seed', None)
+            self.is_demucs_parallel_bag = getattr(model_data, 'is_demucs_parallel_bag', True)
             self.is_split_mode = model_data.is_split_mode if not self.demucs_version == DEMUCS_V4 else True
             self.primary_model_name, self.primary_sources = self.cached_source_callback(DEMUCS_ARCH_TYPE, model_name=self.model_basename)
 
@@ -310,6 +336,9 @@ class SeperateAttributes:
         else:
             self.write_to_console(INFERENCE_STEP_1)
         
+    def accumulation_sink(self, windows):
+        return make_sink(self.accumulation_mode, windows.padded_length(), device=self.device, directory=self.accumulation_dir)
+
     def running_inference_progress_bar(self, length, is_match_mix=False):
         if not is_match_mix:
             self.progress_value += 1
@@ -383,10 +412,78 @@ class SeperateAttributes:
         
         return {stem_name: source}
     
+    def resolve_precision(self, kind, run, reference_shape, level=REFERENCE_RMS):
+        """
+        Returns the autocast context factory for the forward pass. A reduced
+        `inference_dtype` is only used when `run` on a fixed reference clip of
+        `reference_shape` (see `reference_clip`) under it stays within
+        `precision_min_sdr` dB of the float32 output; the measurement is kept in
+        the artifact cache per model, dtype, device type, clip and torch version.
+        """
+        # int8 models already run quantized matmuls; autocast does not apply to them.
+        if self.inference_dtype == FLOAT32 or self.inference_dtype not in INFERENCE_DTYPES or self.is_quantized:
+            return contextlib.nullcontext
+
+        key_parts = (kind, MODEL_CATALOG.fingerprint(self.model_path), self.inference_dtype, device_type(self.device), tuple(reference_shape), level, torch.__version__)
+        sdr_db = PRECISION_GATE_RESULTS.get(key_parts)
+        if sdr_db is None:
+            cached_path = ARTIFACT_CACHE.get('precision_gate', key_parts, suffix='.json')
+            if cached_path:
+                with open(cached_path, 'r') as f:
+                    sdr_db = json.load(f)['sdr_db']
+            else:
+                try:
+                    reference = reference_clip(reference_shape, self.device, level=level)
+                    sdr_db = compare_precision(run, reference, self.device, self.inference_dtype)
+                except Exception as e:
+                    print(f'{self.inference_dtype} inference unavailable for {self.model_basename}: {e}')
+                    return contextlib.nullcontext
+
+                def write_result(path):
+                    with open(path, 'w') as f:
+                        json.dump({'sdr_db': sdr_db}, f)
+
+                ARTIFACT_CACHE.get_or_build('precision_gate', key_parts, write_result, suffix='.json')
+            PRECISION_GATE_RESULTS[key_parts] = sdr_db
+
+        if sdr_db < self.precision_min_sdr:
+            print(f'{self.inference_dtype} inference refused for {self.model_basename}: {sdr_db:.1f} dB SDR against float32 (minimum {self.precision_min_sdr:.1f} dB)')
+            return contextlib.nullcontext
+
+        return lambda: inference_autocast(self.device, self.inference_dtype)
+
+    def compile_model(self, kind, model, member=None):
+        """
+        Applies `compile_mode` to `model.forward`. Traced graphs are kept in the
+        artifact cache per model, input shape (segment and batch size), dtype,
+        autocast dtype and torch version; torch.compile uses the inductor cache
+        under the artifact cache directory.
+        """
+        if self.compile_mode == COMPILE_OFF or self.is_quantized:
+            return model
+
+        if self.compile_mode == COMPILE_TORCH:
+            os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.join(ARTIFACT_CACHE.root, 'inductor'))
+            return compile_forward(model, self.compile_mode)
+
+        fingerprint = MODEL_CATALOG.fingerprint(self.model_path)
+        cache_artifact = lambda shape_key, build: ARTIFACT_CACHE.get_or_build('traced', (kind, fingerprint, member, *shape_key, torch.__version__), build, suffix='.pt')
+        return compile_forward(model, self.compile_mode, cache_artifact)
+
+    def load_mix(self):
+        if self.prepared_mix is not None:
+            return self.prepared_mix
+        return prepare_mix(self.audio_file, is_stream=self.is_stream_mix, block_size=self.stream_block_size)
+
     def write_audio(self, stem_path: str, stem_source, samplerate, stem_name=None):
         
         def save_audio_file(path, source):
             source = spec_utils.normalize(source, self.is_normalization)
+
+            if self.export_stem:
+                self.export_stem(path, source, samplerate, self.save_format if is_not_ensemble else WAV)
+                return
+
             sf.write(path, source, samplerate, subtype=self.wav_type_set)
 
             if is_not_ensemble:
@@ -413,15 +510,16 @@ class SeperateAttributes:
 
             self.write_to_console(f'{SAVING_STEM[0]}{stem_name}{SAVING_STEM[1]}')
             
-            if is_deverb and is_not_ensemble:
-                deverb_vocals(stem_path, stem_source)
-            
-            save_audio_file(stem_path, stem_source)
+            with self.timer.span('write_stem', stem=stem_name):
+                if is_deverb and is_not_ensemble:
+                    deverb_vocals(stem_path, stem_source)
+                
+                save_audio_file(stem_path, stem_source)
             self.write_to_console(DONE, base_text='')
             
         def deverb_vocals(stem_path:str, stem_source):
             self.write_to_console(INFERENCE_STEP_DEVERBING, base_text='')
-            stem_source_deverbed, stem_source_2 = vr_denoiser(stem_source, self.device, is_deverber=True, model_path=self.DEVERBER_MODEL)
+            stem_source_deverbed, stem_source_2 = vr_denoiser(stem_source, self.device, is_deverber=True, model_path=self.DEVERBER_MODEL, is_quantized=self.is_quantized)
             save_audio_file(stem_path.replace(".wav", "_deverbed.wav"), stem_source_deverbed)
             save_audio_file(stem_path.replace(".wav", "_reverb_only.wav"), stem_source_2)
             
@@ -477,23 +575,28 @@ class SeperateMDX(SeperateAttributes):
         # --- MUDANÇA: Remover verificação de cache ---
         self.start_inference_console_write()
 
-        if self.is_mdx_ckpt:
-            model_params = torch.load(self.model_path, map_location=lambda storage, loc: storage)['hyper_parameters']
-            self.dim_c, self.hop = model_params['dim_c'], model_params['hop_length']
-            separator = MdxnetSet.ConvTDFNet(**model_params)
-            self.model_run = separator.load_from_checkpoint(self.model_path).to(self.device).eval()
-        else:
-            if self.mdx_segment_size == self.dim_t and not self.is_other_gpu:
-                ort_ = ort.InferenceSession(self.model_path, providers=self.run_type)
-                self.model_run = lambda spek:ort_.run(None, {'input': spek.cpu().numpy()})[0]
+        with self.timer.span('model_load'):
+            if self.is_mdx_ckpt:
+                self.model_run, model_params = self.load_mdx_ckpt()
+                self.dim_c, self.hop = model_params['dim_c'], model_params['hop_length']
             else:
-                self.model_run = ConvertModel(load(self.model_path))
-                self.model_run.to(self.device).eval()
+                if self.mdx_segment_size == self.dim_t and not self.is_other_gpu:
+                    if torch.device(self.device).type == 'cpu':
+                        sessions = self.load_onnx_cpu_sessions()
+                        # One chunk per session in each batch, so every session has work.
+                        self.mdx_batch_size = max(self.mdx_batch_size, len(sessions))
+                        self.model_run = OrtParallelEngine(sessions)
+                    else:
+                        self.model_run = OrtEngine(self.load_onnx_session(), self.device)
+                else:
+                    self.model_run = self.load_onnx_converted()
 
         self.running_inference_console_write()
-        mix = prepare_mix(self.audio_file)
+        with self.timer.span('decode'):
+            mix = self.load_mix()
         
-        source = self.demix(mix)
+        with self.timer.span('inference'):
+            source = self.demix(mix)
         
         self.write_to_console(DONE, base_text='')            
 
@@ -506,7 +609,7 @@ class SeperateMDX(SeperateAttributes):
             secondary_stem_path = os.path.join(self.export_path, f'{self.audio_file_base}_({self.secondary_stem}).wav')
             if not isinstance(self.secondary_source, np.ndarray):
                 raw_mix = self.demix(self.match_frequency_pitch(mix), is_match_mix=True) if mdx_net_cut else self.match_frequency_pitch(mix)
-                self.secondary_source = spec_utils.invert_stem(raw_mix, source) if self.is_invert_spec else mix.T-source.T
+                self.secondary_source = spec_utils.invert_stem(raw_mix, source) if self.is_invert_spec else invert_mix(mix, source).T
             
             self.secondary_source_map = self.final_process(secondary_stem_path, self.secondary_source, self.secondary_source_secondary, self.secondary_stem, samplerate)
         
@@ -518,6 +621,8 @@ class SeperateMDX(SeperateAttributes):
                 
             self.primary_source_map = self.final_process(primary_stem_path, self.primary_source, self.secondary_source_primary, self.primary_stem, samplerate)
         
+        if isinstance(self.model_run, OrtParallelEngine):
+            self.model_run.close()
         clear_gpu_cache()
 
         secondary_sources = {**self.primary_source_map, **self.secondary_source_map}
@@ -527,6 +632,60 @@ class SeperateMDX(SeperateAttributes):
         if self.is_secondary_model or self.is_pre_proc_model:
             return secondary_sources
 
+    def load_mdx_ckpt(self):
+        import lib_v5.mdxnet as MdxnetSet
+
+        def read_checkpoint():
+            # Only the weights and hyper parameters are kept (no optimizer state), so the artifact loads with mmap.
+            checkpoint = torch.load(self.model_path, map_location=cpu, weights_only=False)
+            return {'hyper_parameters': to_builtins(checkpoint['hyper_parameters']), 'state_dict': checkpoint['state_dict']}
+
+        def loader():
+            key_parts = (MODEL_CATALOG.model_hash(self.model_path), torch.__version__)
+            checkpoint = load_torch_artifact('mdx_ckpt', key_parts, read_checkpoint, weights_only=True, mmap=True)
+            model_params = checkpoint['hyper_parameters']
+            model = MdxnetSet.ConvTDFNet(**model_params)
+            model.load_state_dict(checkpoint['state_dict'])
+            return self.compile_model('mdx_ckpt', model.to(self.device).eval()), model_params
+
+        key = MODEL_REGISTRY.make_key('mdx_ckpt', self.model_basename, self.model_path, self.device, self.compile_mode)
+        return MODEL_REGISTRY.get(key, loader)
+
+    def load_onnx_session(self):
+        import onnxruntime as ort
+
+        key = MODEL_REGISTRY.make_key('onnx', self.model_basename, self.model_path, self.device, tuple(self.run_type))
+        return MODEL_REGISTRY.get(key, lambda:ort.InferenceSession(self.model_path, providers=self.run_type), nbytes=os.path.getsize(self.model_path))
+
+    def load_onnx_cpu_sessions(self):
+        import onnxruntime as ort
+        from lib_v5.ort_engine import available_cores, cpu_signature, create_cpu_sessions, optimize_onnx_model
+
+        count = self.ort_cpu_sessions
+        threads = self.ort_cpu_threads or max(1, available_cores() // count)
+
+        def loader():
+            # The ORT-optimized graph depends on the ORT version and the CPU it was optimized on.
+            key_parts = (MODEL_CATALOG.model_hash(self.model_path), ort.__version__, cpu_signature())
+            optimized_path = ARTIFACT_CACHE.get_or_build('onnx_cpu', key_parts, lambda path: optimize_onnx_model(self.model_path, path), suffix='.onnx')
+            return create_cpu_sessions(optimized_path or self.model_path, count, threads, is_optimized=optimized_path is not None)
+
+        key = MODEL_REGISTRY.make_key('onnx_cpu', self.model_basename, self.model_path, cpu, count, threads)
+        return MODEL_REGISTRY.get(key, loader, nbytes=os.path.getsize(self.model_path) * count)
+
+    def load_onnx_converted(self):
+        import onnx2pytorch
+        from onnx import load
+
+        def loader():
+            # The converted module is pickled whole; it needs the same onnx2pytorch to load.
+            key_parts = (MODEL_CATALOG.model_hash(self.model_path), onnx2pytorch.__version__, torch.__version__)
+            model = load_torch_artifact('onnx_torch', key_parts, lambda:onnx2pytorch.ConvertModel(load(self.model_path)), weights_only=False)
+            return model.to(self.device).eval()
+
+        key = MODEL_REGISTRY.make_key('onnx_torch', self.model_basename, self.model_path, self.device)
+        return MODEL_REGISTRY.get(key, loader)
+
     def initialize_model_settings(self):
         self.n_bins = self.n_fft//2+1
         self.trim = self.n_fft//2
@@ -534,11 +693,16 @@ class SeperateMDX(SeperateAttributes):
         self.gen_size = self.chunk_size-2*self.trim
         self.stft = STFT(self.n_fft, self.hop, self.dim_f, self.device)
 
+    def overlap_window(self, chunk_size, overlap):
+        if overlap == 0:
+            return torch.ones(chunk_size, dtype=torch.float32, device=self.device)
+
+        return torch.hann_window(chunk_size, periodic=False, dtype=torch.float32, device=self.device)
+
     def demix(self, mix, is_match_mix=False):
         self.initialize_model_settings()
         
         org_mix = mix
-        tar_waves_ = []
 
         if is_match_mix:
             chunk_size = self.hop * (256-1)
@@ -551,58 +715,41 @@ class SeperateMDX(SeperateAttributes):
                 mix, sr_pitched = spec_utils.change_pitch_semitones(mix, 44100, semitone_shift=-self.semitone_shift)
 
         gen_size = chunk_size-2*self.trim
-
-        pad = gen_size + self.trim - ((mix.shape[-1]) % gen_size)
-        mixture = np.concatenate((np.zeros((2, self.trim), dtype='float32'), mix, np.zeros((2, pad), dtype='float32')), 1)
-
         step = self.chunk_size - self.n_fft if overlap == DEFAULT else int((1 - overlap) * chunk_size)
-        result = np.zeros((1, 2, mixture.shape[-1]), dtype=np.float32)
-        divider = np.zeros((1, 2, mixture.shape[-1]), dtype=np.float32)
-        total = 0
-        total_chunks = (mixture.shape[-1] + step - 1) // step
-
-        for i in range(0, mixture.shape[-1], step):
-            total += 1
-            start = i
-            end = min(i + chunk_size, mixture.shape[-1])
-
-            chunk_size_actual = end - start
-
-            if overlap == 0:
-                window = None
-            else:
-                window = np.hanning(chunk_size_actual)
-                window = np.tile(window[None, None, :], (1, 2, 1))
-
-            mix_part_ = mixture[:, start:end]
-            if end != i + chunk_size:
-                pad_size = (i + chunk_size) - end
-                mix_part_ = np.concatenate((mix_part_, np.zeros((2, pad_size), dtype='float32')), axis=-1)
 
-            mix_part = torch.tensor([mix_part_], dtype=torch.float32).to(self.device)
-            mix_waves = mix_part.split(self.mdx_batch_size)
-            
-            with torch.no_grad():
-                for mix_wave in mix_waves:
-                    self.running_inference_progress_bar(total_chunks, is_match_mix=is_match_mix)
+        def pad_right(length):
+            # Pads to whole generation steps, then far enough that every window is full length.
+            pad = gen_size + self.trim - (length % gen_size)
+            total_chunks = (self.trim + length + pad + step - 1) // step
+            return (total_chunks - 1) * step + chunk_size - self.trim - length
+
+        windows = SlidingWindows(mix, chunk_size, step, pad_left=self.trim, pad_right=pad_right, block_size=self.stream_block_size)
+        batch_size = max(1, self.mdx_batch_size)
+        accumulator = OverlapAdd(chunk_size, window=self.overlap_window(chunk_size, overlap), device=self.device,
+                                 capacity=chunk_size + batch_size * step, sink=self.accumulation_sink(windows))
+        total_batches = (windows.total_windows() + batch_size - 1) // batch_size
+
+        def run_batch(batch):
+            self.running_inference_progress_bar(total_batches, is_match_mix=is_match_mix)
+            offsets, mix_parts = zip(*batch)
+            mix_wave = torch.from_numpy(np.stack(mix_parts)).to(self.device)
+            if self.inference_autocast is None and not is_match_mix:
+                self.inference_autocast = self.resolve_precision(MDX_ARCH_TYPE, self.run_model, mix_wave[:1].shape) if self.is_mdx_ckpt else contextlib.nullcontext
+            accumulator.add(offsets, self.run_model(mix_wave, is_match_mix=is_match_mix))
+            accumulator.flush(offsets[-1] + step)
 
-                    tar_waves = self.run_model(mix_wave, is_match_mix=is_match_mix)
-                    
-                    if window is not None:
-                        tar_waves[..., :chunk_size_actual] *= window 
-                        divider[..., start:end] += window
-                    else:
-                        divider[..., start:end] += 1
-
-                    result[..., start:end] += tar_waves[..., :end-start]
-            
-        tar_waves = result / divider
-        tar_waves_.append(tar_waves)
-
-        tar_waves_ = np.vstack(tar_waves_)[:, :, self.trim:-self.trim]
-        tar_waves = np.concatenate(tar_waves_, axis=-1)[:, :mix.shape[-1]]
-        
-        source = tar_waves[:,0:None]
+        with torch.no_grad():
+            batch = []
+            for offset, mix_part in windows:
+                batch.append((offset, mix_part))
+                if len(batch) == batch_size:
+                    run_batch(batch)
+                    batch = []
+            if batch:
+                run_batch(batch)
+
+        source = accumulator.result(self.trim, windows.length)
+        del accumulator
 
         if self.is_pitch_change and not is_match_mix:
             source = self.pitch_fix(source, sr_pitched, org_mix)
@@ -613,9 +760,9 @@ class SeperateMDX(SeperateAttributes):
             if NO_STEM in self.primary_stem_native or self.primary_stem_native == INST_STEM:
                 if org_mix.shape[1] != source.shape[1]:
                     source = spec_utils.match_array_shapes(source, org_mix)
-                source = org_mix - vr_denoiser(org_mix-source, self.device, model_path=self.DENOISER_MODEL)
+                source = org_mix - vr_denoiser(org_mix-source, self.device, model_path=self.DENOISER_MODEL, is_quantized=self.is_quantized)
             else:
-                source = vr_denoiser(source, self.device, model_path=self.DENOISER_MODEL)
+                source = vr_denoiser(source, self.device, model_path=self.DENOISER_MODEL, is_quantized=self.is_quantized)
 
         return source
 
@@ -625,11 +772,13 @@ class SeperateMDX(SeperateAttributes):
         spek[:, :, :3, :] *= 0 
 
         if is_match_mix:
-            spec_pred = spek.cpu().numpy()
+            spec_pred = spek
         else:
-            spec_pred = -self.model_run(-spek)*0.5+self.model_run(spek)*0.5 if self.is_denoise else self.model_run(spek)
+            # OrtEngine returns a reused buffer: the first result is consumed (negated) before the second run.
+            with (self.inference_autocast or contextlib.nullcontext)():
+                spec_pred = -self.model_run(-spek)*0.5+self.model_run(spek)*0.5 if self.is_denoise else self.model_run(spek)
 
-        return self.stft.inverse(torch.tensor(spec_pred).to(self.device)).cpu().detach().numpy()
+        return self.stft.inverse(spec_pred)
 
 class SeperateMDXC(SeperateAttributes):        
 
@@ -640,8 +789,10 @@ class SeperateMDXC(SeperateAttributes):
         # --- MUDANÇA: Remover verificação de cache ---
         self.start_inference_console_write()
         self.running_inference_console_write()
-        mix = prepare_mix(self.audio_file)
-        sources = self.demix(mix)
+        with self.timer.span('decode'):
+            mix = self.load_mix()
+        with self.timer.span('inference'):
+            sources = self.demix(mix)
         self.write_to_console(DONE, base_text='')
 
         stem_list = [self.mdx_c_configs.training.target_instrument] if self.mdx_c_configs.training.target_instrument else [i for i in self.mdx_c_configs.training.instruments]
@@ -697,12 +848,16 @@ class SeperateMDXC(SeperateAttributes):
                         self.secondary_source = secondary_source.T 
                     else:
                         self.secondary_source, raw_mix = source_primary, self.match_frequency_pitch(mix)
-                        self.secondary_source = spec_utils.to_shape(self.secondary_source, raw_mix.shape)
-                    
-                        if self.is_invert_spec:
-                            self.secondary_source = spec_utils.invert_stem(raw_mix, self.secondary_source)
+                        
+                        if isinstance(raw_mix, AudioStream):
+                            self.secondary_source = invert_mix(raw_mix, self.secondary_source).T
                         else:
-                            self.secondary_source = (-self.secondary_source.T+raw_mix.T)
+                            self.secondary_source = spec_utils.to_shape(self.secondary_source, raw_mix.shape)
+                        
+                            if self.is_invert_spec:
+                                self.secondary_source = spec_utils.invert_stem(raw_mix, self.secondary_source)
+                            else:
+                                self.secondary_source = (-self.secondary_source.T+raw_mix.T)
                             
                 self.secondary_source_map = self.final_process(secondary_stem_path, self.secondary_source, self.secondary_source_secondary, self.secondary_stem, samplerate)    
 
@@ -727,10 +882,8 @@ class SeperateMDXC(SeperateAttributes):
         if self.is_pitch_change:
             mix, sr_pitched = spec_utils.change_pitch_semitones(mix, 44100, semitone_shift=-self.semitone_shift)
 
-        model = TFC_TDF_net(self.mdx_c_configs, device=self.device)
-        model.load_state_dict(torch.load(self.model_path, map_location=cpu))
-        model.to(self.device).eval()
-        mix = torch.tensor(mix, dtype=torch.float32)
+        with self.timer.span('model_load'):
+            model = self.load_model()
 
         try:
             S = model.num_target_instruments
@@ -744,45 +897,60 @@ class SeperateMDXC(SeperateAttributes):
         overlap = self.overlap_mdx23
 
         hop_size = chunk_size // overlap
-        mix_shape = mix.shape[1]
-        pad_size = hop_size - (mix_shape - chunk_size) % hop_size
-        mix = torch.cat([torch.zeros(2, chunk_size - hop_size), mix, torch.zeros(2, pad_size + chunk_size - hop_size)], 1)
-
-        chunks = mix.unfold(1, chunk_size, hop_size).transpose(0, 1)
-        batches = [chunks[i : i + batch_size] for i in range(0, len(chunks), batch_size)]
-        
-        X = torch.zeros(S, *mix.shape) if S > 1 else torch.zeros_like(mix)
-        X = X.to(self.device)
+        pad_right = lambda length:hop_size - (length - chunk_size) % hop_size + chunk_size - hop_size
+
+        windows = SlidingWindows(mix, chunk_size, hop_size, pad_left=chunk_size - hop_size, pad_right=pad_right, block_size=self.stream_block_size)
+        accumulator = OverlapAdd(chunk_size, divisor=overlap, device=self.device,
+                                 capacity=chunk_size + batch_size * hop_size, sink=self.accumulation_sink(windows))
+        total_batches = (windows.total_windows() + batch_size - 1) // batch_size
+
+        def run_batch(batch):
+            self.running_inference_progress_bar(total_batches)
+            offsets, chunks = zip(*batch)
+            chunks = torch.from_numpy(np.stack(chunks)).to(self.device)
+            if self.inference_autocast is None:
+                self.inference_autocast = self.resolve_precision('MDX-C', model, chunks[:1].shape)
+            with self.inference_autocast():
+                sources = model(chunks)
+            accumulator.add(offsets, sources)
+            accumulator.flush(offsets[-1] + hop_size)
 
         with torch.no_grad():
-            cnt = 0
-            for batch in batches:
-                self.running_inference_progress_bar(len(batches))
-                x = model(batch.to(self.device))
-                
-                for w in x:
-                    X[..., cnt * hop_size : cnt * hop_size + chunk_size] += w
-                    cnt += 1
-
-        estimated_sources = X[..., chunk_size - hop_size:-(pad_size + chunk_size - hop_size)] / overlap
-        del X
+            batch = []
+            for offset, chunk in windows:
+                batch.append((offset, chunk))
+                if len(batch) == batch_size:
+                    run_batch(batch)
+                    batch = []
+            if batch:
+                run_batch(batch)
+
+        estimated_sources = accumulator.result(chunk_size - hop_size, windows.length)
+        del accumulator
         pitch_fix = lambda s:self.pitch_fix(s, sr_pitched, org_mix)
 
         if S > 1:
-            sources = {k: pitch_fix(v) if self.is_pitch_change else v for k, v in zip(self.mdx_c_configs.training.instruments, estimated_sources.cpu().detach().numpy())}
+            sources = {k: pitch_fix(v) if self.is_pitch_change else v for k, v in zip(self.mdx_c_configs.training.instruments, estimated_sources)}
             del estimated_sources
             if self.is_denoise_model:
                 if VOCAL_STEM in sources.keys() and INST_STEM in sources.keys():
-                    sources[VOCAL_STEM] = vr_denoiser(sources[VOCAL_STEM], self.device, model_path=self.DENOISER_MODEL)
+                    sources[VOCAL_STEM] = vr_denoiser(sources[VOCAL_STEM], self.device, model_path=self.DENOISER_MODEL, is_quantized=self.is_quantized)
                     if sources[VOCAL_STEM].shape[1] != org_mix.shape[1]:
                         sources[VOCAL_STEM] = spec_utils.match_array_shapes(sources[VOCAL_STEM], org_mix)
                     sources[INST_STEM] = org_mix - sources[VOCAL_STEM]
                             
             return sources
         else:
-            est_s = estimated_sources.cpu().detach().numpy()
-            del estimated_sources
-            return pitch_fix(est_s) if self.is_pitch_change else est_s
+            return pitch_fix(estimated_sources) if self.is_pitch_change else estimated_sources
+
+    def load_model(self):
+        def loader():
+            model = TFC_TDF_net(self.mdx_c_configs, device=self.device)
+            model.load_state_dict(torch.load(self.model_path, map_location=cpu))
+            return self.compile_model('mdx_c', model.to(self.device).eval())
+
+        key = MODEL_REGISTRY.make_key('mdx_c', self.model_basename, self.model_path, self.device, self.compile_mode)
+        return MODEL_REGISTRY.get(key, loader)
 
 class SeperateDemucs(SeperateAttributes):
     def seperate(self):
@@ -799,31 +967,35 @@ class SeperateDemucs(SeperateAttributes):
         # --- MUDANÇA: Remover verificação de cache ---
         self.start_inference_console_write()
 
-        mix = prepare_mix(self.audio_file)
+        with self.timer.span('decode'):
+            mix = self.load_mix()
+
+            if isinstance(mix, AudioStream):
+                # Demucs normalizes with whole-track statistics, so the stream is
+                # decoded once into a single preallocated float32 buffer.
+                mix = mix.load()
         
-        if self.demucs_version == DEMUCS_V1:
-            if str(self.model_path).endswith(".gz"):
-                self.model_path = gzip.open(self.model_path, "rb")
-            klass, args, kwargs, state = torch.load(self.model_path)
-            self.demucs = klass(*args, **kwargs)
-            self.demucs.to(self.device) 
-            self.demucs.load_state_dict(state)
-        elif self.demucs_version == DEMUCS_V2:
-            self.demucs = auto_load_demucs_model_v2(self.demucs_source_list, self.model_path)
-            self.demucs.to(self.device) 
-            self.demucs.load_state_dict(torch.load(self.model_path))
-            self.demucs.eval()
-        else:  
-            self.demucs = HDemucs(sources=self.demucs_source_list)
-            self.demucs = _gm(name=os.path.splitext(os.path.basename(self.model_path))[0], 
-                                repo=Path(os.path.dirname(self.model_path)))
-            self.demucs = demucs_segments(self.segment, self.demucs)
-            self.demucs.to(self.device)
-            self.demucs.eval()
+        with self.timer.span('model_load'):
+            if self.demucs_version == DEMUCS_V1:
+                if str(self.model_path).endswith(".gz"):
+                    self.model_path = gzip.open(self.model_path, "rb")
+                klass, args, kwargs, state = torch.load(self.model_path)
+                self.demucs = klass(*args, **kwargs)
+                self.demucs.to(self.device) 
+                self.demucs.load_state_dict(state)
+            elif self.demucs_version == DEMUCS_V2:
+                from demucs.model_v2 import auto_load_demucs_model_v2
+                self.demucs = auto_load_demucs_model_v2(self.demucs_source_list, self.model_path)
+                self.demucs.to(self.device) 
+                self.demucs.load_state_dict(torch.load(self.model_path))
+                self.demucs.eval()
+            else:  
+                self.demucs = self.load_demucs_model()
 
         self.running_inference_console_write(is_no_write=is_no_write)
         
-        source = self.demix_demucs(mix)
+        with self.timer.span('inference'):
+            source = self.demix_demucs(mix)
         
         self.write_to_console(DONE, base_text='')
         
@@ -937,6 +1109,32 @@ class SeperateDemucs(SeperateAttributes):
             if self.is_secondary_model:    
                 return secondary_sources
     
+    def load_demucs_model(self):
+        from demucs.apply import demucs_segments
+        from demucs.hdemucs import HDemucs
+        from demucs.pretrained import get_model as _gm
+
+        torch.serialization.add_safe_globals([HDemucs])
+
+        def load_float():
+            demucs = _gm(name=os.path.splitext(os.path.basename(self.model_path))[0], 
+                         repo=Path(os.path.dirname(self.model_path)))
+            return demucs_segments(self.segment, demucs)
+
+        def loader():
+            if self.is_quantized:
+                return load_quantized_model('demucs', self.model_path, load_float, self.segment)
+            demucs = load_float()
+            demucs.to(self.device)
+            demucs.eval()
+            if self.demucs_version in [DEMUCS_V3, DEMUCS_V4]:
+                for member, model in enumerate(getattr(demucs, 'models', [demucs])):
+                    self.compile_model('demucs', model, member)
+            return demucs
+
+        key = MODEL_REGISTRY.make_key('demucs', self.model_basename, self.model_path, self.device, self.segment, self.is_quantized, self.compile_mode)
+        return MODEL_REGISTRY.get(key, loader)
+
     def demix_demucs(self, mix):
         
         org_mix = mix
@@ -950,6 +1148,9 @@ class SeperateDemucs(SeperateAttributes):
         mix = (mix - ref.mean()) / ref.std()
         mix_infer = mix 
         
+        from demucs.apply import apply_model
+        from demucs.utils import apply_model_v1, apply_model_v2
+
         with torch.no_grad():
             if self.demucs_version == DEMUCS_V1:
                 sources = apply_model_v1(self.demucs, 
@@ -965,14 +1166,25 @@ class SeperateDemucs(SeperateAttributes):
                                             self.overlap,
                                             set_progress_bar=self.set_progress_bar)
             else:
-                sources = apply_model(self.demucs, 
-                                        mix_infer[None], 
-                                        self.shifts,
-                                        self.is_split_mode,
-                                        self.overlap,
-                                        static_shifts=1 if self.shifts == 0 else self.shifts,
-                                        set_progress_bar=self.set_progress_bar,
-                                        device=self.device)[0]
+                if self.inference_autocast is None:
+                    # Gate without shifts so both precisions see the same input; the mix is normalized, hence a unit RMS clip.
+                    run = lambda clip:apply_model(self.demucs, clip, 0, self.is_split_mode, self.overlap, device=self.device,
+                                                  batch_size=self.demucs_batch_size, parallel_bag=self.is_demucs_parallel_bag)
+                    self.inference_autocast = self.resolve_precision(DEMUCS_ARCH_TYPE, run, (1, mix_infer.shape[0], PRECISION_REFERENCE_SECONDS * 44100), level=1.0)
+
+                with self.inference_autocast():
+                    sources = apply_model(self.demucs, 
+                                            mix_infer[None], 
+                                            self.shifts,
+                                            self.is_split_mode,
+                                            self.overlap,
+                                            static_shifts=1 if self.shifts == 0 else self.shifts,
+                                            set_progress_bar=self.set_progress_bar,
+                                            device=self.device,
+                                            batch_size=self.demucs_batch_size,
+                                            batch_shifts=self.is_demucs_batch_shifts,
+                                            seed=self.demucs_seed,
+                                            parallel_bag=self.is_demucs_parallel_bag)[0]
         
         sources = (sources * ref.std() + ref.mean()).cpu().numpy()
         sources[[0,1]] = sources[[1,0]]
@@ -1065,16 +1277,29 @@ def gather_sources(primary_stem_name, secondary_stem_name, secondary_sources: di
 
     return source_primary, source_secondary
         
-def prepare_mix(mix):
+def invert_mix(mix, source):
+    if isinstance(mix, AudioStream):
+        return mix.subtract(source)
+
+    return mix - source
+
+def prepare_mix(mix, is_stream=False, block_size=STREAM_BLOCK_SIZE):
     
     audio_path = mix
 
     if not isinstance(mix, np.ndarray):
-        mix, sr = librosa.load(mix, mono=False, sr=44100)
+        if is_stream:
+            stream = AudioStream(mix, samplerate=44100, block_size=block_size)
+            # Same mp3 fallback as below, decided on the first block; rerun_mp3 loads the full track.
+            if not (audio_path.endswith('.mp3') and not np.any(next(iter(stream), 0))):
+                return stream
+            mix = rerun_mp3(audio_path)
+        else:
+            mix, sr = librosa.load(mix, mono=False, sr=44100)
     else:
         mix = mix.T
 
-    if isinstance(audio_path, str):
+    if isinstance(audio_path, str) and not is_stream:
         if not np.any(mix) and audio_path.endswith('.mp3'):
             mix = rerun_mp3(audio_path)
 
@@ -1093,6 +1318,7 @@ def rerun_mp3(audio_file, sample_rate=44100):
 def save_format(audio_path, save_format, mp3_bit_set):
     
     if not save_format == WAV:
+        import pydub
         
         if OPERATING_SYSTEM == 'Darwin':
             FFMPEG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ffmpeg')
@@ -1118,6 +1344,8 @@ def save_format(audio_path, save_format, mp3_bit_set):
             print(e)
             
 def pitch_shift(mix):
+    from scipy import signal
+
     new_sr = 31183
 
     # Resample audio file
@@ -1129,7 +1357,56 @@ def list_to_dictionary(lst):
     dictionary = {item: index for index, item in enumerate(lst)}
     return dictionary
 
-def vr_denoiser(X, device, hop_length=1024, n_fft=2048, cropsize=256, is_deverber=False, model_path=None):
+def load_quantized_model(kind, model_path, load_float, *extra):
+    """
+    int8 dynamic-quantized CPU variant of the model built by `load_float()`.
+    The quantized module is pickled in the artifact cache (per model, torch
+    version and quantized engine), so later loads skip both the float
+    checkpoint and the quantization.
+    """
+    from lib_v5.quantization import quantize_dynamic_int8
+
+    key_parts = (kind, MODEL_CATALOG.fingerprint(model_path), torch.__version__, torch.backends.quantized.engine, *extra)
+    return load_torch_artifact('int8', key_parts, lambda:quantize_dynamic_int8(load_float()), weights_only=False).eval()
+
+def load_torch_artifact(kind, key_parts, build, **load_kwargs):
+    """
+    Object saved with torch.save in the artifact cache under `kind`/`key_parts`,
+    loaded on CPU. On a miss, or an unreadable artifact, `build()` makes it and
+    it is saved for the next load.
+    """
+    cached_path = ARTIFACT_CACHE.get(kind, key_parts, suffix='.pt')
+    if cached_path:
+        try:
+            return torch.load(cached_path, map_location=cpu, **load_kwargs)
+        except Exception as e:
+            print(f'Could not load cached {kind} artifact {cached_path}: {e}')
+            # Removed so the rebuilt artifact below replaces it.
+            with contextlib.suppress(OSError):
+                os.remove(cached_path)
+
+    artifact = build()
+    ARTIFACT_CACHE.get_or_build(kind, key_parts, lambda path:torch.save(artifact, path), suffix='.pt')
+    return artifact
+
+def to_builtins(value):
+    """
+    Recursively converts config containers (e.g. OmegaConf DictConfig/ListConfig)
+    and numpy scalars to plain Python types, so they can be loaded with weights_only.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, torch.Tensor)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, collections.abc.Mapping):
+        return {to_builtins(k): to_builtins(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(to_builtins(v) for v in value)
+    if isinstance(value, collections.abc.Iterable) and not isinstance(value, bytes):
+        return [to_builtins(v) for v in value]
+    return str(value)
+
+def vr_denoiser(X, device, hop_length=1024, n_fft=2048, cropsize=256, is_deverber=False, model_path=None, is_quantized=False):
     batchsize = 4
 
     if is_deverber:
@@ -1141,9 +1418,18 @@ def vr_denoiser(X, device, hop_length=1024, n_fft=2048, cropsize=256, is_deverbe
         hop_length=1024
         nout, nout_lstm = 16, 128
     
-    model = nets_new.CascadedNet(n_fft, nout=nout, nout_lstm=nout_lstm)
-    model.load_state_dict(torch.load(model_path, map_location=cpu))
-    model.to(device)
+    def load_float():
+        model = nets_new.CascadedNet(n_fft, nout=nout, nout_lstm=nout_lstm)
+        model.load_state_dict(torch.load(model_path, map_location=cpu))
+        return model
+
+    def loader():
+        if is_quantized:
+            return load_quantized_model('vr_denoiser', model_path, load_float, is_deverber)
+        return load_float().to(device)
+
+    key = MODEL_REGISTRY.make_key('vr_denoiser', os.path.basename(str(model_path)), model_path, device, is_deverber, is_quantized)
+    model = MODEL_REGISTRY.get(key, loader)
 
     if mp is None:
         X_spec = spec_utils.wave_to_spectrogram_old(X, hop_length, n_fft)
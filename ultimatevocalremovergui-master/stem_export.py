@@ -0,0 +1,111 @@
+# stem_export.py
+import io
+import os
+import subprocess
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import soundfile as sf
+
+# --- CONFIGURAÇÕES ---
+STEM_EXPORT_WORKERS = int(os.environ.get('STEM_EXPORT_WORKERS', os.cpu_count() or 4))
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+WAV = 'WAV'
+FLAC = 'FLAC'
+MP3 = 'MP3'
+FLAC_SUBTYPES = ('PCM_16', 'PCM_24')
+
+# --- FUNÇÕES AUXILIARES ---
+def export_path(path, save_format):
+    """Caminho final do stem: 'x.wav' vira 'x.flac' / 'x.mp3' conforme o formato."""
+    if save_format == FLAC:
+        return path.replace(".wav", ".flac")
+    if save_format == MP3:
+        return path.replace(".wav", ".mp3")
+    return path
+
+def encode_mp3(source, samplerate, mp3_bit_set):
+    """Codifica em MP3 pelo ffmpeg, enviando PCM float pelo stdin (sem WAV intermediário)."""
+    channels = source.shape[1] if source.ndim > 1 else 1
+    pcm = source.astype('<f4', copy=False).tobytes()
+    base_cmd = [FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-f', 'f32le', '-ar', str(samplerate),
+                '-ac', str(channels), '-i', 'pipe:0']
+
+    try:
+        return subprocess.run(base_cmd + ['-codec:a', 'libmp3lame', '-b:a', mp3_bit_set, '-f', 'mp3', 'pipe:1'],
+                              input=pcm, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        print(e.stderr.decode(errors='ignore'))
+        return subprocess.run(base_cmd + ['-b:a', mp3_bit_set, '-f', 'mp3', 'pipe:1'],
+                              input=pcm, capture_output=True, check=True).stdout
+
+def encode_stem(source, samplerate, save_format, wav_type_set, mp3_bit_set):
+    """Codifica um stem (frames, canais) direto no formato final e retorna os bytes."""
+    if save_format == MP3:
+        return encode_mp3(source, samplerate, mp3_bit_set)
+
+    buffer = io.BytesIO()
+    if save_format == FLAC:
+        subtype = wav_type_set if wav_type_set in FLAC_SUBTYPES else 'PCM_24'
+        sf.write(buffer, source, samplerate, subtype=subtype, format='FLAC')
+    else:
+        sf.write(buffer, source, samplerate, subtype=wav_type_set, format='WAV')
+    return buffer.getvalue()
+
+class StemExporter:
+    """
+    Exporta os stems de um job em paralelo. Cada stem é codificado a partir do
+    array em memória direto no formato final, gravado em disco e adicionado ao
+    zip assim que fica pronto.
+
+    `zip_target` pode ser um caminho ou um arquivo somente-escrita (p.ex. um
+    `MultipartUploadWriter`); None desativa o zip.
+
+    A codificação roda em threads: libsndfile libera o GIL e o MP3 é feito por
+    um processo ffmpeg, então não há cópia dos arrays para outros processos.
+    """
+
+    def __init__(self, zip_target, wav_type_set, mp3_bit_set, workers=STEM_EXPORT_WORKERS):
+        self.zip_target = zip_target
+        self.wav_type_set = wav_type_set
+        self.mp3_bit_set = mp3_bit_set
+        self.pool = ThreadPoolExecutor(max(1, workers))
+        self.futures = []
+        self.files = []
+        self._zip = zipfile.ZipFile(zip_target, 'w', zipfile.ZIP_DEFLATED) if zip_target is not None else None
+        self._zip_lock = threading.Lock()
+
+    def submit(self, path, source, samplerate, save_format=WAV):
+        """Compatível com o gancho `export_stem` do process_data."""
+        self.futures.append(self.pool.submit(self._export, path, source, samplerate, save_format))
+
+    def _export(self, path, source, samplerate, save_format):
+        data = encode_stem(source, samplerate, save_format, self.wav_type_set, self.mp3_bit_set)
+        path = export_path(path, save_format)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        with self._zip_lock:
+            self.files.append(path)
+            if self._zip is not None:
+                # MP3/FLAC já são comprimidos; só o WAV passa pelo deflate.
+                compress_type = zipfile.ZIP_DEFLATED if save_format == WAV else zipfile.ZIP_STORED
+                self._zip.writestr(os.path.basename(path), data, compress_type=compress_type)
+
+    def close(self):
+        """Espera todos os stems e fecha o zip. Relança o primeiro erro de exportação."""
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.pool.shutdown()
+            if self._zip is not None:
+                self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
@@ -0,0 +1,177 @@
+# timing.py
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- CONFIGURAÇÕES ---
+# Arquivo JSONL onde cada job acrescenta uma linha com suas etapas; vazio desativa.
+TIMING_LOG = os.environ.get('TIMING_LOG', '')
+
+_log_lock = threading.Lock()
+# Etapas abertas por timer no processo: os contadores de pico são globais e só podem ser zerados sem outros jobs medindo.
+_peak_lock = threading.Lock()
+_open_spans = {}
+
+# --- FUNÇÕES AUXILIARES ---
+def _read_peak_rss_mb():
+    """Pico de RSS do processo (VmHWM no Linux, ru_maxrss nos demais)."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+def _reset_peak_rss():
+    """Zera o VmHWM (Linux) para medir o pico de cada etapa; sem efeito onde não é suportado."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _reset_peaks(timer, cuda):
+    """Zera os picos de RSS e CUDA se nenhum outro timer tiver etapas abertas; senão os picos seguem acumulados."""
+    if any(count for other, count in _open_spans.items() if other is not timer):
+        return
+    _reset_peak_rss()
+    if cuda is not None:
+        cuda.reset_peak_memory_stats()
+
+def _cuda():
+    try:
+        import torch
+        return torch.cuda if torch.cuda.is_available() and torch.cuda.is_initialized() else None
+    except Exception:
+        return None
+
+class Span:
+    __slots__ = ('name', 'depth', 'wall_s', 'cpu_s', 'peak_rss_mb', 'peak_device_mb', 'extra')
+
+    def __init__(self, name, depth, extra):
+        self.name = name
+        self.depth = depth
+        self.wall_s = self.cpu_s = 0.0
+        self.peak_rss_mb = 0.0
+        self.peak_device_mb = None
+        self.extra = extra
+
+    def to_dict(self):
+        data = {'name': self.name, 'depth': self.depth, 'wall_s': round(self.wall_s, 4), 'cpu_s': round(self.cpu_s, 4),
+                'peak_rss_mb': round(self.peak_rss_mb, 1)}
+        if self.peak_device_mb is not None:
+            data['peak_device_mb'] = round(self.peak_device_mb, 1)
+        return {**data, **self.extra}
+
+class JobTimer:
+    """
+    Cronômetro por etapas de um job. Cada `span` registra tempo de parede,
+    tempo de CPU do processo e o pico de RSS (e de memória CUDA, se houver)
+    durante a etapa. Etapas podem ser aninhadas; o pico de uma etapa inclui o
+    das etapas internas.
+
+    O CPU e a memória são do processo inteiro, então jobs simultâneos no mesmo
+    processo aparecem nos números uns dos outros. Os picos só são zerados na
+    abertura de uma etapa quando nenhum outro timer tem etapas abertas; com
+    jobs simultâneos, o pico de uma etapa é o do processo desde o último reset.
+    """
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self.spans = []
+        self._stack = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **extra):
+        cuda = _cuda()
+        with self._lock, _peak_lock:
+            record = Span(name, len(self._stack), extra)
+            self.spans.append(record)
+            # O pico acumulado até aqui pertence à etapa externa, antes de zerar os contadores.
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_rss_mb = max(parent.peak_rss_mb, _read_peak_rss_mb())
+                if cuda is not None:
+                    parent.peak_device_mb = max(parent.peak_device_mb or 0.0, cuda.max_memory_allocated() / 1024**2)
+            self._stack.append(record)
+            _reset_peaks(self, cuda)
+            _open_spans[self] = _open_spans.get(self, 0) + 1
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.process_time() - cpu
+            with self._lock, _peak_lock:
+                if _open_spans[self] > 1:
+                    _open_spans[self] -= 1
+                else:
+                    del _open_spans[self]
+                record.peak_rss_mb = max(record.peak_rss_mb, _read_peak_rss_mb())
+                cuda = cuda or _cuda()
+                if cuda is not None:
+                    record.peak_device_mb = max(record.peak_device_mb or 0.0, cuda.max_memory_allocated() / 1024**2)
+                self._stack.remove(record)
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent.peak_rss_mb = max(parent.peak_rss_mb, record.peak_rss_mb)
+                    if record.peak_device_mb is not None:
+                        parent.peak_device_mb = max(parent.peak_device_mb or 0.0, record.peak_device_mb)
+
+    def summary(self):
+        with self._lock:
+            return [span.to_dict() for span in self.spans]
+
+    def write_log(self, path=TIMING_LOG, **fields):
+        """Acrescenta as etapas do job como uma linha JSON em `path`."""
+        if not path:
+            return
+        line = json.dumps({'job_id': self.job_id, 'timestamp': time.time(), **fields, 'spans': self.summary()})
+        try:
+            with _log_lock, open(path, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"Falha ao gravar o log de tempos em {path}: {e}")
+
+    def print_summary(self):
+        for span in self.summary():
+            indent = '  ' * span['depth']
+            device = f", device {span['peak_device_mb']:.0f} MB" if 'peak_device_mb' in span else ''
+            print(f"  {indent}{span['name']}: {span['wall_s']:.2f}s (CPU {span['cpu_s']:.2f}s, "
+                  f"RSS {span['peak_rss_mb']:.0f} MB{device})")
+
+class NullTimer:
+    """Mesma interface do JobTimer sem medir nada (padrão quando o job não passa um timer)."""
+
+    job_id = None
+    spans = []
+
+    @contextlib.contextmanager
+    def span(self, name, **extra):
+        yield None
+
+    def summary(self):
+        return []
+
+    def write_log(self, path=TIMING_LOG, **fields):
+        pass
+
+    def print_summary(self):
+        pass
+
+NULL_TIMER = NullTimer()